@@ -0,0 +1,101 @@
+"""
+clean_text 基准：与旧实现（逐条未编译 re.sub、逐行 re.sub）比较输出与吞吐。
+
+    python benchmarks/bench_clean_text.py                 # 合成语料
+    python benchmarks/bench_clean_text.py a.pdf b.pdf     # 以 PDF 文字层为语料
+
+先在黄金语料上逐条比对两种实现的输出，任何不一致都以非零退出码结束；
+再报告两者的 字符/秒。
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.clean_data import clean_text  # noqa: E402
+
+
+def legacy_clean_text(text):
+    """优化前的实现，作为输出参照"""
+    text = text.replace("〜", "至")
+    text = re.sub(r"[■»>●◆※▪•★◆◇▶▲▼■]", "", text)
+    text = re.sub(r"[\x00-\x1F\x7F]", "", text)
+    lines = text.splitlines()
+    stripped_lines = [re.sub(r"[ \t　]+$", "", line) for line in lines]
+    paragraph = " ".join(stripped_lines)
+    paragraph = re.sub(r"[（(【\[]?\s*图\s*\d+(?:[-－–—]\d+)*\s*[）)】\]]?", "", paragraph)
+    paragraph = re.sub(r"[（(]图.*?[）)]", "", paragraph)
+    paragraph = re.sub(r"[ \t]+", " ", paragraph)
+    return paragraph.strip()
+
+
+# 合成语料的字符来源：正文、规则涉及的符号、各类空白与分行符
+WORDS = ["压力容器", "设计", "温度", "材料", "见", "如", "所示", "参数", "Table", "value", "0.5MPa",
+         "图", "图3", "图 2-1", "（图4）", "(图5 结构示意)", "【图6】", "[图 7–2]", "图8－3", "图9—1",
+         "10〜20", "■", "»", ">", "●", "◆", "※", "▪", "•", "★", "◇", "▶", "▲", "▼"]
+SPACES = [" ", "  ", "\t", "　", "\r\n", "\n", "\x0b", "\x0c", "\x1c", "\x85", " ", "\x7f", "\x00"]
+
+
+def synthetic_corpus(count, seed=0):
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(50, 800)):
+            parts.append(rng.choice(WORDS))
+            if rng.random() < 0.4:
+                parts.append(rng.choice(SPACES))
+        docs.append("".join(parts))
+    # 边界情况
+    docs += ["", " ", "\n", "图", "（图", "(图)", "图1", "　图1　\n", "a　 \nb", "\x85  ", "〜〜"]
+    return docs
+
+
+def pdf_corpus(paths):
+    import fitz
+    docs = []
+    for path in paths:
+        with fitz.open(path) as doc:
+            docs.extend(page.get_text() for page in doc)
+    return docs
+
+
+def throughput(func, docs, repeat):
+    chars = sum(len(d) for d in docs)
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for d in docs:
+            func(d)
+        samples.append(time.perf_counter() - t0)
+    return chars / statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="用作语料的 PDF，缺省时使用合成语料")
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = pdf_corpus(args.pdfs) if args.pdfs else synthetic_corpus(args.docs)
+    mismatches = [d for d in docs if clean_text(d) != legacy_clean_text(d)]
+    print(f"黄金语料: {len(docs)} 段, {sum(len(d) for d in docs)} 字符, 不一致 {len(mismatches)} 段")
+    for d in mismatches[:5]:
+        print(f"  输入:   {d[:80]!r}")
+        print(f"  旧实现: {legacy_clean_text(d)[:80]!r}")
+        print(f"  新实现: {clean_text(d)[:80]!r}")
+
+    before = throughput(legacy_clean_text, docs, args.repeat)
+    after = throughput(clean_text, docs, args.repeat)
+    print(f"旧实现: {before / 1e6:.2f} M 字符/秒")
+    print(f"新实现: {after / 1e6:.2f} M 字符/秒 ({after / before:.2f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
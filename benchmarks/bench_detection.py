@@ -0,0 +1,133 @@
+"""
+图形检测基准：对比 full（整页轮廓）与 multires（缩小图 + 连通域统计）两种模式的耗时与一致性。
+
+    python benchmarks/bench_detection.py                 # 合成页面
+    python benchmarks/bench_detection.py some.pdf --dpi 300 --pages 20
+
+一致性以 full 模式结果为参照：IoU >= 0.9 视为同一个图形，报告召回率、精确率与平均 IoU。
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.extract_imgs import detect_figures  # noqa: E402
+
+
+def synthetic_pages(count, width=2550, height=3300, seed=0):
+    """生成 300dpi A4 大小的合成页面：若干文字行 + 随机位置的图形（实心块、线框图、照片噪声）"""
+    rng = np.random.default_rng(seed)
+    pages = []
+    for _ in range(count):
+        page = np.full((height, width, 3), 255, dtype=np.uint8)
+        # 文字行
+        for y in range(200, height - 200, 60):
+            x = 200
+            while x < width - 300:
+                w = int(rng.integers(20, 120))
+                cv2.rectangle(page, (x, y), (x + w, y + 28), (30, 30, 30), -1)
+                x += w + int(rng.integers(12, 30))
+        # 图形（互不重叠）
+        placed = []
+        for _ in range(int(rng.integers(1, 4))):
+            w, h = int(rng.integers(400, 1100)), int(rng.integers(400, 900))
+            x, y = int(rng.integers(150, width - w - 150)), int(rng.integers(150, height - h - 300))
+            if any(x < px1 + 80 and px0 < x + w + 80 and y < py1 + 80 and py0 < y + h + 80
+                   for px0, py0, px1, py1 in placed):
+                continue
+            placed.append((x, y, x + w, y + h))
+            page[y - 40:y + h + 40, x - 40:x + w + 40] = 255
+            kind = rng.integers(0, 3)
+            if kind == 0:
+                cv2.rectangle(page, (x, y), (x + w, y + h), (90, 140, 200), -1)
+            elif kind == 1:
+                cv2.rectangle(page, (x, y), (x + w, y + h), (0, 0, 0), 3)
+                for _ in range(12):
+                    p1 = (int(rng.integers(x, x + w)), int(rng.integers(y, y + h)))
+                    p2 = (int(rng.integers(x, x + w)), int(rng.integers(y, y + h)))
+                    cv2.line(page, p1, p2, (0, 0, 0), 2)
+            else:
+                page[y:y + h, x:x + w] = rng.integers(0, 230, (h, w, 3), dtype=np.uint8)
+        pages.append(page)
+    return pages
+
+
+def pdf_pages(path, dpi, limit):
+    import fitz
+    pages = []
+    with fitz.open(path) as doc:
+        for i, page in enumerate(doc):
+            if limit and i >= limit:
+                break
+            pix = page.get_pixmap(dpi=dpi)
+            pages.append(np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n).copy())
+    return pages
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def compare(ref, got, threshold=0.9):
+    matched, ious, used = 0, [], set()
+    for r in ref:
+        best, best_j = 0.0, None
+        for j, g in enumerate(got):
+            if j in used:
+                continue
+            v = iou(r, g)
+            if v > best:
+                best, best_j = v, j
+        if best_j is not None and best >= threshold:
+            matched += 1
+            used.add(best_j)
+            ious.append(best)
+    return matched, ious
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", help="用于测试的 PDF，缺省时使用合成页面")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = pdf_pages(args.pdf, args.dpi, args.pages) if args.pdf else synthetic_pages(args.pages)
+    results = {}
+    timings = {}
+    for mode in ("full", "multires"):
+        samples = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            results[mode] = [detect_figures(p, mode=mode) for p in pages]
+            samples.append((time.perf_counter() - t0) / len(pages))
+        timings[mode] = statistics.median(samples)
+        print(f"{mode:>9}: {timings[mode] * 1000:.1f} ms/页")
+    print(f"加速比: {timings['full'] / timings['multires']:.2f}x")
+
+    total_ref = sum(len(r) for r in results["full"])
+    total_got = sum(len(r) for r in results["multires"])
+    matched, ious = 0, []
+    for ref, got in zip(results["full"], results["multires"]):
+        m, v = compare(ref, got)
+        matched += m
+        ious.extend(v)
+    print(f"图形数: full {total_ref}, multires {total_got}, 匹配 {matched} (IoU>=0.9)")
+    print(f"召回率 {matched / max(total_ref, 1):.3f}, 精确率 {matched / max(total_got, 1):.3f}, "
+          f"平均 IoU {statistics.mean(ious) if ious else 0:.4f}")
+
+
+if __name__ == "__main__":
+    main()
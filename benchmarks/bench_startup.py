@@ -0,0 +1,81 @@
+"""
+启动耗时基准：
+  * GUI 模块导入耗时（python -c "import gui"），并统计导入期间发起的网络连接数；
+  * 以 spawn 方式启动进程池直到每个工作进程完成 parse 模块导入的耗时。
+
+    python benchmarks/bench_startup.py --repeat 5 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中统计导入耗时与 socket.connect 调用次数
+IMPORT_PROBE = """
+import socket, time, json
+calls = []
+_connect = socket.socket.connect
+def connect(self, *args):
+    calls.append(args)
+    return _connect(self, *args)
+socket.socket.connect = connect
+t0 = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - t0, "connections": len(calls)}}))
+"""
+
+
+def measure_import(module, repeat):
+    samples, connections = [], 0
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(module=module)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        samples.append(r["seconds"])
+        connections = max(connections, r["connections"])
+    return samples, connections
+
+
+def _worker_ready(_):
+    import parse  # noqa: F401  工作进程中真实会导入的模块
+    return os.getpid()
+
+
+def measure_spawn(workers, repeat):
+    ctx = multiprocessing.get_context("spawn")
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with ctx.Pool(workers) as pool:
+            pool.map(_worker_ready, range(workers), chunksize=1)
+            samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def fmt(samples):
+    return f"median {statistics.median(samples) * 1000:.0f} ms (min {min(samples) * 1000:.0f}, max {max(samples) * 1000:.0f})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=min(8, multiprocessing.cpu_count()))
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    for module in ("gui", "parse"):
+        samples, connections = measure_import(module, args.repeat)
+        print(f"import {module:<6}: {fmt(samples)}, 网络连接 {connections} 次")
+    print(f"spawn pool x{args.workers}: {fmt(measure_spawn(args.workers, args.repeat))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+图像跨进程传输基准：对比原有 pickle + Manager 路径与溢出文件句柄路径的吞吐 (MB/s) 与峰值内存。
+
+    python benchmarks/bench_transport.py --pages 64 --figures 6 --size 1200
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.transport import write_arrays, load_arrays, cleanup  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def make_figures(args):
+    i, count, size, spill_dir = args
+    rng = np.random.default_rng(i)
+    figures = [rng.integers(0, 255, (size, size, 3), dtype=np.uint8) for _ in range(count)]
+    if spill_dir:
+        return i, write_arrays(figures, spill_dir, f"page_{i+1}")
+    return i, figures
+
+
+def run(mode, pages, count, size, workers):
+    spill_dir = tempfile.mkdtemp(prefix="spill_") if mode == "spill" else None
+    tasks = [(i, count, size, spill_dir) for i in range(pages)]
+    t0 = time.perf_counter()
+    manager = multiprocessing.Manager()
+    return_dict = manager.dict()
+    images_map = {}
+    with multiprocessing.Pool(workers) as pool:
+        for i, figures in pool.imap_unordered(make_figures, tasks):
+            images_map[i] = figures
+    # 原 extract_pdf / gui 的方式：写入 Manager 再 copy 回来
+    return_dict["images"] = images_map
+    received = return_dict.copy()["images"]
+    checksum = 0
+    for i in sorted(received):
+        for arr in load_arrays(received[i]):
+            checksum += int(arr[0, 0, 0])
+    elapsed = time.perf_counter() - t0
+    manager.shutdown()
+    cleanup(spill_dir)
+    total_mb = pages * count * size * size * 3 / (1024 * 1024)
+    return {
+        "mode": mode,
+        "payload_mb": round(total_mb, 1),
+        "seconds": round(elapsed, 3),
+        "mb_per_s": round(total_mb / elapsed, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "checksum": checksum,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=64)
+    parser.add_argument("--figures", type=int, default=6, help="每页图像数")
+    parser.add_argument("--size", type=int, default=1200, help="图像边长（像素）")
+    parser.add_argument("--workers", type=int, default=min(8, multiprocessing.cpu_count()))
+    parser.add_argument("--mode", choices=["pickle", "spill"], help="只运行一种模式（内部使用）")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run(args.mode, args.pages, args.figures, args.size, args.workers)))
+        return
+
+    # 每种模式在独立进程中运行，保证峰值内存互不影响
+    for mode in ("pickle", "spill"):
+        cmd = [sys.executable, os.path.abspath(__file__), "--mode", mode,
+               "--pages", str(args.pages), "--figures", str(args.figures),
+               "--size", str(args.size), "--workers", str(args.workers)]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{r['mode']:>6}: {r['payload_mb']} MB in {r['seconds']} s "
+              f"-> {r['mb_per_s']} MB/s, peak RSS {r['peak_rss_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+本地百度 OCR 桩服务器，用于联调与基准测试（不消耗真实配额）：
+
+    python benchmarks/fake_ocr_server.py --port 8808 --latency 0.3 --throttle 0.1
+    BAIDU_OCR_BASE_URL=http://127.0.0.1:8808 python cli.py ...
+
+实现 /oauth/2.0/token 与 /rest/2.0/ocr/v1/<endpoint>，按设定延迟返回固定文字，
+并按 --throttle 概率返回 error_code 18（QPS 超限）以检验重试逻辑。
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+class FakeOCRHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive，便于验证连接复用
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        path = urlparse(self.path).path
+        with server.stats_lock:
+            server.stats["requests"] += 1
+            server.stats["bytes"] += length
+            server.stats["connections"].add(self.client_address)
+
+        if path == "/oauth/2.0/token":
+            self._reply({"access_token": "fake-token", "expires_in": 2592000})
+            return
+        if not path.startswith("/rest/2.0/ocr/v1/"):
+            self.send_error(404)
+            return
+        if server.latency:
+            time.sleep(server.latency)
+        if random.random() < server.throttle:
+            with server.stats_lock:
+                server.stats["throttled"] += 1
+            self._reply({"error_code": 18, "error_msg": "Open api qps request limit reached"})
+            return
+        self._reply({
+            "words_result_num": len(server.lines),
+            "words_result": [
+                {"words": line, "location": {"left": 0, "top": k * 20, "width": 100, "height": 18}}
+                for k, line in enumerate(server.lines)
+            ],
+        })
+
+
+def start_server(port=0, latency=0.0, throttle=0.0, lines=("fake ocr text",)):
+    """在后台线程启动桩服务器，返回 (server, base_url)；用 server.shutdown() 停止"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOCRHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.throttle = throttle
+    server.lines = list(lines)
+    server.stats = {"requests": 0, "bytes": 0, "throttled": 0, "connections": set()}
+    server.stats_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", type=float, default=0.0, help="每次 OCR 请求的模拟延迟（秒）")
+    parser.add_argument("--throttle", type=float, default=0.0, help="返回限流错误的概率")
+    args = parser.parse_args()
+    server, url = start_server(args.port, args.latency, args.throttle)
+    print(f"fake OCR server listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
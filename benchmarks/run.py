@@ -0,0 +1,180 @@
+"""
+端到端基准：合成 PDF + 本地 OCR 桩服务器，分别计时各处理阶段，结果写成 JSON，可与基线比较。
+
+    python benchmarks/run.py --pages 20 --scanned 0.3 --figures 1.5 --ocr-latency 0.05 -o result.json
+    python benchmarks/run.py --baseline baseline.json            # 与基线比较，回归时退出码为 1
+    python benchmarks/run.py --save-baseline baseline.json       # 记录新的基线
+
+阶段：render（整页渲染）、clean_text、extract_image（图形检测与裁剪，图例 OCR 用进程内假后端）、
+ocr（扫描页整页经 HTTP 请求桩服务器，走真实的百度客户端）、record（保存工作记录）、export（导出）。
+每个阶段重复 --repeat 次取中位数。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ocr_server import start_server  # noqa: E402
+from synthetic import make_pdf  # noqa: E402
+
+STAGES = ("render", "clean_text", "extract_image", "ocr", "record", "export")
+RESULT_VERSION = 1
+
+
+def timed(func, repeat):
+    """重复执行 func，返回 (中位数耗时, 全部样本, 最后一次的返回值)"""
+    samples, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples), samples, result
+
+
+def run(args, workdir):
+    # 必须在导入项目模块之前设置：OCR 指向桩服务器、不使用结果缓存、token 缓存写到临时目录
+    server, url = start_server(latency=args.ocr_latency)
+    os.environ["BAIDU_OCR_BASE_URL"] = url
+    os.environ["OCR_CACHE"] = "0"
+    os.environ["PDF2MD_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ.setdefault("BAIDU_OCR_QPS", "1000")
+
+    import fitz
+    from parse import render_page
+    from utils.clean_data import clean_text
+    from utils.extract_imgs import extract_image
+    from utils.extract_txt import baidu_ocr_image
+    from utils.ocr_backends import set_backend
+    from utils.record import save_record
+    from utils.project_store import ProjectStore
+    from utils.export import export_markdown
+
+    pdf_path = make_pdf(os.path.join(workdir, "synthetic.pdf"), args.pages, args.scanned,
+                        args.figures, args.vector, args.seed)
+    doc = fitz.open(pdf_path)
+    pages = list(doc)
+    texts = [p.get_text().strip() for p in pages]
+    scanned = [i for i, t in enumerate(texts) if not t]
+
+    stages = {}
+
+    def record(name, seconds, samples):
+        stages[name] = {"seconds": seconds, "per_page_ms": seconds / len(pages) * 1000, "samples": samples}
+        print(f"{name:>14}: {seconds:.3f} 秒, {seconds / len(pages) * 1000:.1f} ms/页")
+
+    seconds, samples, rasters = timed(lambda: [render_page(p, args.dpi) for p in pages], args.repeat)
+    record("render", seconds, samples)
+
+    seconds, samples, md_content = timed(lambda: [clean_text(t) for t in texts], args.repeat)
+    record("clean_text", seconds, samples)
+
+    set_backend("fake", latency=0)
+    images_content, descriptions = {}, {}
+
+    def detect():
+        for i, img in enumerate(rasters):
+            images_content[i], descriptions[i] = extract_image(img, "output", i)
+
+    seconds, samples, _ = timed(detect, args.repeat)
+    record("extract_image", seconds, samples)
+
+    set_backend("baidu")
+    seconds, samples, ocr_texts = timed(lambda: [baidu_ocr_image(rasters[i]) for i in scanned], args.repeat)
+    record("ocr", seconds, samples)
+    for i, text in zip(scanned, ocr_texts):
+        md_content[i] = clean_text(text)
+
+    store = ProjectStore(os.path.join(workdir, "record"))
+    seconds, samples, _ = timed(
+        lambda: save_record(store, pdf_path, 0, md_content, images_content, descriptions), args.repeat)
+    record("record", seconds, samples)
+    store.close()
+
+    export_dir = os.path.join(workdir, "export")
+    seconds, samples, _ = timed(
+        lambda: export_markdown(export_dir, md_content, images_content, descriptions), args.repeat)
+    record("export", seconds, samples)
+
+    doc.close()
+    server.shutdown()
+    return {
+        "version": RESULT_VERSION,
+        "config": {k: getattr(args, k) for k in
+                   ("pages", "scanned", "figures", "vector", "seed", "dpi", "ocr_latency", "repeat")},
+        "counts": {"pages": len(pages), "scanned": len(scanned),
+                   "figures": sum(len(v) for v in images_content.values()),
+                   "ocr_requests": server.stats["requests"]},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count()},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": stages,
+    }
+
+
+def compare(result, baseline, tolerance, min_delta):
+    """逐阶段与基线比较，返回回归的阶段列表"""
+    if baseline.get("config") != result["config"]:
+        print("⚠️ 基线的配置与本次不同，比较结果仅供参考")
+    regressions = []
+    print(f"\n{'阶段':<14}{'基线(s)':>10}{'本次(s)':>10}{'变化':>10}")
+    for name in STAGES:
+        old = baseline.get("stages", {}).get(name)
+        new = result["stages"].get(name)
+        if not old or not new:
+            continue
+        ratio = new["seconds"] / max(old["seconds"], 1e-9)
+        regressed = ratio > 1 + tolerance and new["seconds"] - old["seconds"] > min_delta
+        mark = "  ❌ 回归" if regressed else ""
+        print(f"{name:<14}{old['seconds']:>10.3f}{new['seconds']:>10.3f}{(ratio - 1) * 100:>+9.1f}%{mark}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--scanned", type=float, default=0.3, help="扫描页比例")
+    parser.add_argument("--figures", type=float, default=1.5, help="每页平均图形数")
+    parser.add_argument("--vector", type=float, default=0.3, help="文字层页面中矢量图的比例")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--ocr-latency", type=float, default=0.05, help="桩服务器每次 OCR 的模拟延迟（秒）")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", help="结果 JSON 路径")
+    parser.add_argument("--baseline", help="与该基线 JSON 比较，任一阶段回归则退出码为 1")
+    parser.add_argument("--save-baseline", help="将本次结果另存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对变慢比例")
+    parser.add_argument("--min-delta", type=float, default=0.01, help="低于该秒数的变慢不算回归")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="pdf2md_bench_") as workdir:
+        result = run(args, workdir)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            print(f"结果已写入 {path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\n❌ 性能回归: {', '.join(regressions)}")
+            return 1
+        print("\n✅ 无性能回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
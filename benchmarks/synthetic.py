@@ -0,0 +1,135 @@
+"""
+合成 PDF 生成器：可配置页数、文字层页 / 扫描页比例、每页图形数量。
+
+    python benchmarks/synthetic.py out.pdf --pages 20 --scanned 0.3 --figures 2
+
+文字层页面：正文用 insert_text 写入（有文字层），图形为嵌入的光栅图或矢量图，图下方有图例文字；
+扫描页：整页是一张光栅图（画出的文字行 + 图形），没有文字层，需要 OCR。
+"""
+import argparse
+import random
+
+import cv2
+import fitz
+import numpy as np
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4，单位 pt
+MARGIN = 50
+LINE_HEIGHT = 14
+SENTENCES = [
+    "Pressure vessel design temperature and material selection follow the standard.",
+    "The allowable stress is reduced at elevated temperature, see table 3.",
+    "Welded joints shall be inspected by radiography before hydrostatic testing.",
+    "Nozzle reinforcement is calculated by the area replacement method.",
+]
+
+
+def _figure_array(rng, width, height):
+    """随机图形：色块 + 线条 + 噪声区域"""
+    img = np.full((height, width, 3), 255, dtype=np.uint8)
+    cv2.rectangle(img, (0, 0), (width - 1, height - 1), (0, 0, 0), 3)
+    for _ in range(rng.randint(3, 8)):
+        color = tuple(rng.randint(0, 200) for _ in range(3))
+        p1 = (rng.randint(0, width), rng.randint(0, height))
+        p2 = (rng.randint(0, width), rng.randint(0, height))
+        cv2.rectangle(img, p1, p2, color, -1) if rng.random() < 0.5 else cv2.line(img, p1, p2, color, 4)
+    y0, x0 = height // 3, width // 3
+    img[y0:y0 + height // 4, x0:x0 + width // 4] = np.random.default_rng(rng.randint(0, 1 << 30)).integers(
+        0, 230, (height // 4, width // 4, 3), dtype=np.uint8)
+    return img
+
+
+def _png(img):
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+def _figure_slots(rng, count):
+    """在页面上纵向排布互不重叠的图形位置（pt），返回 [fitz.Rect]"""
+    slots = []
+    band = (PAGE_HEIGHT - 2 * MARGIN) / max(count, 1)
+    for k in range(count):
+        h = min(band - 40, rng.uniform(150, 260))
+        # 长宽比保持在图形检测接受的 0.5~2 之间
+        w = rng.uniform(h * 0.7, min(h * 1.8, PAGE_WIDTH - 2 * MARGIN))
+        x = rng.uniform(MARGIN, PAGE_WIDTH - MARGIN - w)
+        y = MARGIN + k * band + 10
+        slots.append(fitz.Rect(x, y, x + w, y + h))
+    return slots
+
+
+def _text_page(doc, rng, figures, vector):
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    slots = _figure_slots(rng, figures)
+    for k, rect in enumerate(slots):
+        if vector:
+            shape = page.new_shape()
+            shape.draw_rect(rect)
+            for _ in range(8):
+                shape.draw_line((rng.uniform(rect.x0, rect.x1), rng.uniform(rect.y0, rect.y1)),
+                                (rng.uniform(rect.x0, rect.x1), rng.uniform(rect.y0, rect.y1)))
+            shape.finish(color=(0, 0, 0), fill=(0.4, 0.6, 0.8), width=1.5)
+            shape.commit()
+        else:
+            page.insert_image(rect, stream=_png(_figure_array(rng, int(rect.width * 2), int(rect.height * 2))))
+        page.insert_text((rect.x0, rect.y1 + 14), f"Figure {k + 1} synthetic legend", fontsize=10)
+    # 正文写在图形之间的空白处
+    y = MARGIN
+    while y < PAGE_HEIGHT - MARGIN:
+        if not any(r.y0 - LINE_HEIGHT <= y <= r.y1 + 24 for r in slots):
+            page.insert_text((MARGIN, y), rng.choice(SENTENCES), fontsize=10)
+        y += LINE_HEIGHT
+    return page
+
+
+def _scanned_page(doc, rng, figures, dpi=200):
+    scale = dpi / 72
+    w, h = int(PAGE_WIDTH * scale), int(PAGE_HEIGHT * scale)
+    img = np.full((h, w, 3), 255, dtype=np.uint8)
+    slots = _figure_slots(rng, figures)
+    for rect in slots:
+        x0, y0, x1, y1 = (int(v * scale) for v in rect)
+        img[y0:y1, x0:x1] = _figure_array(rng, x1 - x0, y1 - y0)
+    y = MARGIN
+    while y < PAGE_HEIGHT - MARGIN:
+        if not any(r.y0 - LINE_HEIGHT <= y <= r.y1 + 10 for r in slots):
+            cv2.putText(img, rng.choice(SENTENCES), (int(MARGIN * scale), int(y * scale)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (20, 20, 20), 2)
+        y += LINE_HEIGHT
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_image(page.rect, stream=_png(img))
+    return page
+
+
+def make_pdf(path, pages=10, scanned=0.3, figures=1.5, vector=0.3, seed=0):
+    """
+    生成合成 PDF。scanned: 扫描页比例；figures: 每页平均图形数；
+    vector: 文字层页面中用矢量图（而不是嵌入光栅图）的比例。返回 path。
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        count = min(3, int(figures) + (rng.random() < figures - int(figures)))
+        if rng.random() < scanned:
+            _scanned_page(doc, rng, count)
+        else:
+            _text_page(doc, rng, count, rng.random() < vector)
+    doc.save(path, deflate=True)
+    doc.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--scanned", type=float, default=0.3, help="扫描页比例")
+    parser.add_argument("--figures", type=float, default=1.5, help="每页平均图形数")
+    parser.add_argument("--vector", type=float, default=0.3, help="文字层页面中矢量图的比例")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    make_pdf(args.output, args.pages, args.scanned, args.figures, args.vector, args.seed)
+    print(f"已生成 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# cli.py
+"""
+无界面批量转换：
+
+    python cli.py a.pdf b.pdf some_dir/ -o out/ --workers 8
+
+每个 PDF 导出到 out/{pdf文件名}/，结构与 GUI 导出一致
+（export.md / images/ / image_descriptions.json）。
+所有文档的页面共享同一个进程池，总并发数由 --workers 决定。
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+from parse import process_page_index, _init_worker, merge_page_stats, format_page_stats, collect_metrics
+from utils.export import export_markdown, EXPORT_FORMAT, EXPORT_PNG_LEVEL, IMAGE_FORMATS
+from utils.transport import load_arrays, cleanup as cleanup_spill
+from utils.ocr_cache import get_cache, reset_cache
+from utils.ocr_backends import BACKENDS, DEFAULT_BACKEND
+from utils.clean_data import DEFAULT_PROFILE, PROFILES, register_rule
+from utils.resolution import format_render_stats
+from utils import metrics
+
+
+def collect_pdfs(inputs, recursive=False):
+    """展开命令行参数中的文件与目录，返回去重后的 PDF 路径列表"""
+    pdfs = []
+    for item in inputs:
+        if os.path.isdir(item):
+            if recursive:
+                for dirpath, dirnames, filenames in os.walk(item):
+                    dirnames.sort()  # 遍历顺序固定，重名文档的导出目录名在多次运行间保持一致
+                    pdfs.extend(os.path.join(dirpath, n) for n in sorted(filenames) if n.lower().endswith(".pdf"))
+            else:
+                pdfs.extend(os.path.join(item, n) for n in sorted(os.listdir(item)) if n.lower().endswith(".pdf"))
+        elif os.path.isfile(item):
+            pdfs.append(item)
+        else:
+            print(f"⚠️ 跳过不存在的路径: {item}", file=sys.stderr)
+    seen = set()
+    result = []
+    for p in pdfs:
+        key = os.path.abspath(p)
+        if key not in seen:
+            seen.add(key)
+            result.append(key)
+    return result
+
+
+def _run_page(args):
+    """在工作进程中处理一页，附带文档路径与耗时，异常不会中断整个批次"""
+    path = args[0]
+    t0 = time.perf_counter()
+    try:
+        result = process_page_index(args)
+        error = None
+    except Exception as e:
+        result = (args[1], "", [], [], {})
+        error = f"第 {args[1] + 1} 页: {e}"
+    return path, result, time.perf_counter() - t0, error
+
+
+def _doc_name(path, used):
+    """导出子目录名：取 PDF 文件名，与已有文档重名时（不同目录下的同名文件）加路径哈希后缀"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name.lower() in used:
+        name = f"{name}-{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+    used.add(name.lower())
+    return name
+
+
+def _finish_doc(doc, output_root, export_options=None):
+    """导出一个文档；导出失败记入该文档的错误，不中断整个批次。无论成败都删除溢出文件"""
+    try:
+        doc["figures"] = _export_doc(doc, output_root, export_options)
+    except Exception as e:
+        doc["errors"].append(f"导出失败: {e}")
+    # 此时导出用到的映射已随 _export_doc 的局部变量（及异常）释放，Windows 上才能删除文件
+    doc["images"] = {}
+    cleanup_spill(doc["spill_dir"])
+    doc["end"] = time.perf_counter()
+
+
+def _export_doc(doc, output_root, export_options=None):
+    total = doc["pages"]
+    md_content = [doc["text"].get(i, "") for i in range(total)]
+    images_content = {i: load_arrays(imgs) for i, imgs in sorted(doc["images"].items())}
+    image_descriptions = {i: list(doc["legends"][i]) for i in images_content}
+    export_folder = os.path.join(output_root, doc["name"])
+    _, fig_total = export_markdown(export_folder, md_content, images_content, image_descriptions,
+                                   **(export_options or {}))
+    return fig_total
+
+
+def run_batch(pdfs, output_root, workers, dpi=300, ocr_backend=None, export_options=None, profile=DEFAULT_PROFILE):
+    """将所有文档的页面交给同一个进程池处理，文档完成即导出，返回每个文档的统计"""
+    docs = {}
+    tasks = []
+    used_names = set()
+    for path in pdfs:
+        try:
+            with fitz.open(path) as d:
+                pages = len(d)
+        except Exception as e:
+            print(f"❌ 无法打开 {path}: {e}", file=sys.stderr)
+            continue
+        name = _doc_name(path, used_names)
+        # 溢出文件放在临时目录，不留在导出目录中
+        spill_dir = tempfile.mkdtemp(prefix=f"pdf2md-{name}-", suffix=".spill")
+        docs[path] = {
+            "name": name, "pages": pages, "spill_dir": spill_dir, "remaining": pages,
+            "text": {}, "images": {}, "legends": {}, "errors": [],
+            "start": None, "end": None, "busy": 0.0, "figures": 0, "stats": {},
+        }
+        tasks.extend((path, i, dpi, spill_dir, profile) for i in range(pages))
+
+    # 页数为 0 的文档直接导出
+    for path, doc in docs.items():
+        if doc["pages"] == 0:
+            doc["start"] = time.perf_counter()
+            _finish_doc(doc, output_root, export_options)
+
+    if tasks:
+        submitted = time.time()
+        with multiprocessing.Pool(processes=workers, initializer=_init_worker,
+                                  initargs=(None, workers, ocr_backend)) as pool:
+            for path, (i, text, images, legends, stats), seconds, error in pool.imap_unordered(_run_page, tasks):
+                now = time.perf_counter()
+                doc = docs[path]
+                collect_metrics(stats, submitted)
+                merge_page_stats(doc["stats"], stats)
+                doc["start"] = now - seconds if doc["start"] is None else min(doc["start"], now - seconds)
+                doc["busy"] += seconds
+                doc["text"][i] = text
+                if images:
+                    doc["images"][i] = images
+                    doc["legends"][i] = legends
+                if error:
+                    doc["errors"].append(error)
+                doc["remaining"] -= 1
+                if doc["remaining"] == 0:
+                    _finish_doc(doc, output_root, export_options)
+                    # 导出后释放该文档的结果
+                    doc["text"], doc["images"], doc["legends"] = {}, {}, {}
+                    print(f"✅ {doc['name']}: {doc['pages']} 页, {doc['figures']} 个图形")
+    return docs
+
+
+def print_summary(docs, wall, dpi=300):
+    print()
+    print(f"{'文档':<32} {'页数':>6} {'图形':>6} {'耗时(s)':>9} {'页/秒':>8} {'CPU(s)':>9} {'错误':>5}")
+    total_pages = 0
+    total_stats = {}
+    for doc in docs.values():
+        merge_page_stats(total_stats, doc["stats"])
+        elapsed = max((doc["end"] or 0) - (doc["start"] or 0), 1e-9)
+        total_pages += doc["pages"]
+        print(f"{doc['name'][:32]:<32} {doc['pages']:>6} {doc['figures']:>6} {elapsed:>9.2f} "
+              f"{doc['pages'] / elapsed:>8.2f} {doc['busy']:>9.2f} {len(doc['errors']):>5}")
+        if doc["stats"]:
+            print(f"    {format_render_stats(doc['stats']['render'], dpi)}")
+        for err in doc["errors"]:
+            print(f"    ⚠️ {err}")
+    print(f"共 {len(docs)} 个文档, {total_pages} 页, 总耗时 {wall:.2f} 秒, "
+          f"{total_pages / max(wall, 1e-9):.2f} 页/秒")
+    for line in format_page_stats(total_stats, dpi):
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量将 PDF 转换为 Markdown（无界面）")
+    parser.add_argument("inputs", nargs="+", help="PDF 文件或包含 PDF 的目录")
+    parser.add_argument("-o", "--output", required=True, help="导出根目录")
+    parser.add_argument("-r", "--recursive", action="store_true", help="递归扫描子目录")
+    parser.add_argument("-w", "--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="全局工作进程数（所有文档共享）")
+    parser.add_argument("--dpi", type=int, default=300, help="页面渲染分辨率")
+    parser.add_argument("--ocr-backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help="OCR 后端（默认取环境变量 OCR_BACKEND，否则为 baidu）")
+    parser.add_argument("--image-format", choices=IMAGE_FORMATS, default=EXPORT_FORMAT,
+                        help="导出图像格式（默认取环境变量 PDF2MD_EXPORT_FORMAT，否则为 png）")
+    parser.add_argument("--png-level", type=int, choices=range(10), default=EXPORT_PNG_LEVEL, metavar="0-9",
+                        help="导出 PNG 的压缩级别（默认直接复用工作记录中级别 1 的 PNG，新图像用 PIL 默认级别）")
+    parser.add_argument("--clean-profile", default=DEFAULT_PROFILE,
+                        help=f"文本清洗配置（已有: {', '.join(sorted(PROFILES))}；新名称从默认配置复制）")
+    parser.add_argument("--clean-rule", action="append", default=[], metavar="REGEX",
+                        help="向清洗配置追加一条删除规则，可重复指定")
+    parser.add_argument("--no-ocr-cache", action="store_true", help="不读写 OCR 结果缓存")
+    parser.add_argument("--clear-ocr-cache", action="store_true", help="运行前清空 OCR 结果缓存")
+    parser.add_argument("--trace", metavar="DIR",
+                        help="记录各阶段耗时，写出 DIR/batch.metrics.json 与 Chrome trace（DIR/batch.trace.json）")
+    args = parser.parse_args(argv)
+
+    if args.no_ocr_cache:
+        # 工作进程在首次使用时按环境变量创建缓存
+        os.environ["OCR_CACHE"] = "0"
+    if args.clear_ocr_cache:
+        get_cache().clear()
+        # 关闭父进程的连接并丢弃实例：fork 出的工作进程不能继承打开的 SQLite 连接
+        reset_cache()
+    if args.trace:
+        metrics.enable(args.trace)
+    # 规则须在创建进程池之前注册，工作进程随 fork 继承
+    for pattern in args.clean_rule:
+        try:
+            register_rule(args.clean_profile, pattern)
+        except re.error as e:
+            parser.error(f"无效的清洗规则 {pattern!r}: {e}")
+
+    pdfs = collect_pdfs(args.inputs, args.recursive)
+    if not pdfs:
+        print("未找到 PDF 文件", file=sys.stderr)
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    t0 = time.perf_counter()
+    docs = run_batch(pdfs, args.output, max(1, args.workers), args.dpi, args.ocr_backend,
+                     {"image_format": args.image_format, "png_level": args.png_level}, args.clean_profile)
+    wall = time.perf_counter() - t0
+    print_summary(docs, wall, args.dpi)
+    if args.trace:
+        paths = metrics.write("batch", wall, max(1, args.workers))
+        print(f"性能记录: {paths[0]}, {paths[1]}")
+    if not args.no_ocr_cache:
+        stats = get_cache().stats()
+        print(f"OCR 缓存: {stats['entries']} 条, {stats['bytes'] / 1024:.0f} KB")
+    return 0 if all(not d["errors"] for d in docs.values()) else 2
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,6 +1,5 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import fitz  # PyMuPDF
 import threading
 import queue
 import numpy as np
@@ -8,12 +7,17 @@ import multiprocessing
 import os
 import sys
 from PIL import Image, ImageTk
-import json
-from parse import extract_pdf
-import shutil
+from utils.transport import load_arrays, cleanup as cleanup_spill
+from utils.export import export_markdown
+from utils.record import (RecordWriter, submit_record, submit_extraction_start, submit_page_result,
+                          submit_extraction_done)
+from utils.project_store import ProjectStore, open_project, has_project
+from utils.figures import FigureRef, get_figure_cache, thumbnail
+from utils.md_preview import MarkdownPreviewRenderer, PREVIEW_DELAY_MS
+from utils.page_cache import (PageRenderCache, PagePrefetcher, render_page_image,
+                              CLIP_RENDER_PIXELS, CLIP_MARGIN, ZOOM_SETTLE_MS)
+from utils import metrics
 import time
-from tkhtmlview import HTMLLabel
-import markdown
 from PIL import Image, ImageTk, ImageGrab  # NEW
 
 # 放在 import 之后、Tk() 之前
@@ -43,6 +47,9 @@ class PDFCleanerGUI:
         # 变量初始化
         self.pdf_path = None
         self.pdf_document = None
+        # 页面预览位图缓存 + 相邻页预渲染线程
+        self.page_cache = PageRenderCache()
+        self.prefetcher = None
         self.current_page = 0
         self.total_pages = 0
         self.zoom_factor = 1.0
@@ -51,10 +58,35 @@ class PDFCleanerGUI:
         self.image_descriptions = {}
         self.images_content = {}
         self.export_dir = None
-        self.record_path = None
+        self.store = None  # 项目存储（导出目录下的 project.sqlite3）
         self.canvas_image_id = None  # 用于复用canvas上的图片
+        # 画布上清晰位图的信息：缩放、图像、在整页（该缩放下）中的像素范围、是否只渲染了可见区域
+        self.page_view = None
+        self.page_size = (0, 0)  # 当前页尺寸（PDF 点）
+        self.page_origin = (0, 0)  # 页面左上角在画布上的坐标
+        self.zoom_job = None
+        self.view_job = None
+        # 脏标记：只把改动过的页面 / 图像 / 描述写回记录
+        self.dirty_md_pages = set()
+        self.dirty_image_pages = set()
+        self.dirty_desc_pages = set()
+        self.record_dirty = False
+        self.saved_page = 0  # 项目存储中记录的 current_page
+        # 正在后台处理、结果尚未到达的页面；每次导入递增 processing_token，旧处理结果据此丢弃
+        self.pending_pages = set()
+        self.processing_token = 0
+        self.export_cancel = None  # 正在导出时为 threading.Event
+        self.processing_cancel = None  # 正在处理时为 multiprocessing.Event
 
         self.communication_queue = queue.Queue()
+        # 记录写盘在后台线程进行，进度经 communication_queue 回到界面线程
+        self.record_writer = RecordWriter(
+            on_progress=lambda done, total: self.communication_queue.put(("save_progress", (done, total)))
+        )
+        # 缩略图加载线程：常驻一个线程（只占一个数据库连接），只处理最新一次请求
+        self.thumb_requests = queue.Queue()
+        self.thumb_token = 0
+        threading.Thread(target=self.load_thumbnails, daemon=True).start()
 
         # 主布局
         self.main_paned = ttk.PanedWindow(root, orient=tk.HORIZONTAL)
@@ -73,8 +105,8 @@ class PDFCleanerGUI:
         self.pdf_canvas = tk.Canvas(
             self.canvas_frame,
             bg='white',
-            xscrollcommand=self.x_scrollbar.set,
-            yscrollcommand=self.y_scrollbar.set
+            xscrollcommand=lambda *args: (self.x_scrollbar.set(*args), self.on_view_changed()),
+            yscrollcommand=lambda *args: (self.y_scrollbar.set(*args), self.on_view_changed())
         )
         self.x_scrollbar.config(command=self.pdf_canvas.xview)
         self.y_scrollbar.config(command=self.pdf_canvas.yview)
@@ -84,6 +116,7 @@ class PDFCleanerGUI:
         self.canvas_frame.grid_rowconfigure(0, weight=1)
         self.canvas_frame.grid_columnconfigure(0, weight=1)
         self.pdf_canvas.bind("<MouseWheel>", self.on_mousewheel)
+        self.pdf_canvas.bind("<Configure>", lambda e: self.on_view_changed())
 
         # 右侧Notebook
         self.right_frame = ttk.Frame(self.main_paned)
@@ -109,11 +142,18 @@ class PDFCleanerGUI:
 
 
         # Markdown预览标签页
+        # HTMLLabel（tkhtmlview）在首次切换到预览页时再创建，加快启动
         self.preview_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.preview_tab, text="预览")
-        self.preview_html_label = HTMLLabel(self.preview_tab, html="", background="white", width=100)
-        self.preview_html_label.pack(fill=tk.BOTH, expand=True)
-        
+        self.preview_html_label = None
+        # 预览在后台线程转换，编辑停止 PREVIEW_DELAY_MS 后才提交；预览页不可见时不渲染
+        self.md_renderer = MarkdownPreviewRenderer(
+            lambda generation, html, error: self.communication_queue.put(("md_preview", (generation, html, error)))
+        )
+        self.preview_job = None
+        self.preview_html = None
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
 
         # 图像显示标签页
         self.img_tab = ttk.Frame(self.notebook)
@@ -162,6 +202,14 @@ class PDFCleanerGUI:
         width=10
         )
         self.capture_btn.pack(side=tk.LEFT, padx=2)
+        self.stop_btn = ttk.Button(
+            self.btn_frame,
+            text="停止处理",
+            command=self.stop_processing,
+            state=tk.DISABLED,
+            width=10
+        )
+        self.stop_btn.pack(side=tk.LEFT, padx=2)
 
 
         # 页面导航
@@ -225,8 +273,32 @@ class PDFCleanerGUI:
         self.root.grid_rowconfigure(0, weight=1)
         self.root.grid_columnconfigure(0, weight=1)
 
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.check_processing_queue()
 
+    def on_close(self):
+        """关闭窗口前保存当前页的编辑与阅读位置，并等待后台写盘全部完成"""
+        try:
+            self.processing_token += 1  # 让处理线程停止仍在运行的处理进程
+            if self.processing_cancel is not None:
+                self.processing_cancel.set()
+            if self.md_content:
+                self.commit_current_page()
+                if self.current_page != self.saved_page:
+                    self.record_dirty = True
+                self.save_to_record()
+            if self.record_writer.pending():
+                self.status_var.set("正在写入记录，请稍候...")
+                self.root.update_idletasks()
+            self.record_writer.close()
+            if self.prefetcher:
+                self.prefetcher.close()
+            if self.store:
+                self.store.close()
+            metrics.write("gui")
+        finally:
+            self.root.destroy()
+
     def import_pdf(self):
         """导入PDF文件，并自动查找同名目录恢复历史记录"""
         file_path = filedialog.askopenfilename(
@@ -235,6 +307,10 @@ class PDFCleanerGUI:
         if not file_path:
             return
 
+        if self.md_content:
+            # 切换文档前保存上一个文档未写盘的编辑
+            self.commit_current_page()
+            self.save_to_record()
         self.reset_state()
         self.pdf_path = file_path
 
@@ -242,150 +318,114 @@ class PDFCleanerGUI:
         pdf_dir = os.path.dirname(file_path)
         pdf_name = os.path.splitext(os.path.basename(file_path))[0]
         export_folder = os.path.join(pdf_dir, pdf_name)
-        record_path = os.path.join(export_folder, "record.json")
 
-        if os.path.exists(record_path):
+        if has_project(export_folder):
             # 有历史记录，询问是否恢复
-            if messagebox.askyesno("恢复历史", f"检测到历史编辑记录，是否恢复？\n{record_path}"):
-                self.export_dir = export_folder
-                self.restore_from_record(record_path)
-                self.status_var.set("已从历史记录恢复")
+            if messagebox.askyesno("恢复历史", f"检测到历史编辑记录，是否恢复？\n{export_folder}"):
+                self.restore_from_record(export_folder)
+                if self.pending_pages:
+                    self.status_var.set(f"已从历史记录恢复，继续处理剩余 {len(self.pending_pages)} 页...")
+                else:
+                    self.status_var.set("已从历史记录恢复")
                 return
         try:
-            self.pdf_document = fitz.open(self.pdf_path)
-            self.total_pages = len(self.pdf_document)
+            self.open_pdf_document(self.pdf_path)
             self.export_dir = export_folder
+            self.set_store(ProjectStore(export_folder))
+            submit_extraction_start(self.record_writer, self.store, self.pdf_path, self.total_pages)
             self.update_ui_after_import()
             self.status_var.set(f"正在处理: {os.path.basename(file_path)}...")
-            threading.Thread(target=self.start_processing, daemon=True).start()
+            # 先显示空白页面，各页处理完成后逐页填入，已完成的页面可以立即查看和编辑
+            self.md_content = [""] * self.total_pages
+            self.pending_pages = set(range(self.total_pages))
+            self.display_page(0)
+            self.start_extraction(range(self.total_pages))
         except Exception as e:
             messagebox.showerror("错误", f"无法打开PDF文件: {str(e)}")
             self.status_var.set("导入失败")
 
-    def restore_from_record(self, record_path):
-        """从record.json恢复"""
-        with open(record_path, "r", encoding="utf-8") as f:
-            record = json.load(f)
-        self.export_dir = os.path.dirname(record_path)
-        self.pdf_path = record["pdf_path"]
-        self.current_page = record.get("current_page", 0)
-        self.md_content = []
+    def open_pdf_document(self, pdf_path):
+        import fitz  # PyMuPDF，延迟导入以加快启动
+        document = fitz.open(pdf_path)
+        if self.prefetcher:
+            self.prefetcher.close()
+        self.page_cache.clear()
+        self.pdf_document = document
+        self.total_pages = len(document)
+        self.prefetcher = PagePrefetcher(pdf_path, self.page_cache)
+
+    def set_store(self, store):
+        if self.store is not None and self.store is not store:
+            # 旧项目的写入任务先写完再关闭
+            self.record_writer.flush()
+            self.store.close()
+        self.store = store
+
+    def restore_from_record(self, export_dir):
+        """从项目存储恢复；旧项目（record.json + 分页文件）首次打开时自动迁移"""
+        if os.path.isfile(export_dir):
+            # 兼容传入 record.json / project.sqlite3 路径
+            export_dir = os.path.dirname(export_dir)
+        store = open_project(export_dir)
+        if store is None:
+            return
+        self.set_store(store)
+        self.export_dir = export_dir
+        self.pdf_path = store.get_meta("pdf_path") or self.pdf_path
+        self.current_page = store.get_meta("current_page", 0)
+        texts = store.page_texts()
+        page_count = store.get_meta("page_count", len(texts))
+        self.md_content = [texts.get(i, "") for i in range(page_count)]
         self.image_descriptions = {}
         self.images_content = {}
-        # 恢复md
-        for i, md_path in record["md_files"].items():
-            with open(os.path.join(self.export_dir, md_path), "r", encoding="utf-8") as f:
-                self.md_content.append(f.read())
-        # 恢复图片
-        for i, img_list in record["images_content"].items():
-            self.images_content[int(i)] = []
-            for img_path in img_list:
-                img = Image.open(os.path.join(self.export_dir, img_path))
-                self.images_content[int(i)].append(np.array(img))
-        # 恢复图像描述
-        for i, img_descriptions_list in record["image_descriptions"].items():
-            self.image_descriptions[int(i)] = []
-            for img_descriptions in img_descriptions_list:
-                self.image_descriptions[int(i)].append(img_descriptions)
+        # 图像只恢复为引用，显示或导出时才解码，恢复耗时与图像数量无关
+        for page, (refs, descriptions) in store.figure_refs().items():
+            self.images_content[page] = refs
+            self.image_descriptions[page] = descriptions
+        self.saved_page = self.current_page
         # 恢复PDF
         if self.pdf_path and os.path.exists(self.pdf_path):
-            self.pdf_document = fitz.open(self.pdf_path)
-            self.total_pages = len(self.pdf_document)
+            self.open_pdf_document(self.pdf_path)
+            if not store.get_meta("extraction_done", True):
+                # 上次提取中断：已写入检查点的页面不再处理，从未完成的页面继续
+                self.pending_pages = set(range(page_count)) - set(texts)
+                # 未完成页面已写入的图像来自中断的那次提取，会随本次结果整体替换；
+                # 之后这些页面上的图像只有本次会话中的截图
+                for page in self.pending_pages:
+                    self.images_content.pop(page, None)
+                    self.image_descriptions.pop(page, None)
             self.display_page(self.current_page)
             self.update_ui_after_import()
             self.update_navigation_buttons()
+            if self.pending_pages:
+                self.start_extraction(sorted(self.pending_pages))
+                self.update_processing_progress()
+            elif not store.get_meta("extraction_done", True):
+                submit_extraction_done(self.record_writer, store)
 
 
     def save_to_record(self):
-        if not self.export_dir:
+        """只写回有改动的页面与图像；没有任何改动时不访问磁盘"""
+        if not self.store:
             return
-
-        # 1. 创建目录
-        img_dir = os.path.join(self.export_dir, "images")
-        os.makedirs(img_dir, exist_ok=True)
-
-        md_files = {}
-        images_content_paths = {}
-
-        # --- 测试 MD 保存耗时 ---
-        t_md_start = time.time()
-        for i, md in enumerate(self.md_content):
-            md_path = f"page_{i+1}.md"
-            with open(os.path.join(self.export_dir, md_path), "w", encoding="utf-8") as f:
-                f.write(md)
-            md_files[str(i)] = md_path
-        print(f"▶️ MD 保存耗时：{time.time() - t_md_start:.2f} 秒")
-
-        # --- 测试图片保存耗时 ---
-        t_img_start = time.time()
-        for page_idx, images in self.images_content.items():
-            images_content_paths[str(page_idx)] = []
-            for j, img_array in enumerate(images):
-                #img = Image.fromarray(img_array)
-                img_path = f"images/page_{page_idx+1}_{j}.png"
-                abs_path = os.path.join(self.export_dir, img_path)
-                #img.save(os.path.join(self.export_dir, img_path),format="PNG", compress_level=1)
-                if not os.path.exists(abs_path):
-                    Image.fromarray(img_array).save(abs_path, format="PNG", compress_level=1)
-                images_content_paths[str(page_idx)].append(img_path)
-        print(f"▶️ 图片保存耗时：{time.time() - t_img_start:.2f} 秒")
-
-        # --- 测试 JSON 写入耗时 ---
-        record = {
-            "pdf_path": self.pdf_path,
-            "current_page": self.current_page,
-            "md_files": md_files,
-            "images_content": images_content_paths,
-            "image_descriptions": self.image_descriptions
-        }
-        t_json_start = time.time()
-        with open(os.path.join(self.export_dir, "record.json"), "w", encoding="utf-8") as f:
-            json.dump(record, f, ensure_ascii=False, indent=2)
-        print(f"▶️ JSON 写入耗时：{time.time() - t_json_start:.2f} 秒")
-
-    def init_record(self):
-        if not self.export_dir:
+        if not (self.dirty_md_pages or self.dirty_image_pages or self.dirty_desc_pages or self.record_dirty):
             return
-
-        # 1. 创建目录
-        img_dir = os.path.join(self.export_dir, "images")
-        os.makedirs(img_dir, exist_ok=True)
-
-        md_files = {}
-        images_content_paths = {}
-
-        # --- 测试 MD 保存耗时 ---
-        t_md_start = time.time()
-        for i, md in enumerate(self.md_content):
-            md_path = f"page_{i+1}.md"
-            with open(os.path.join(self.export_dir, md_path), "w", encoding="utf-8") as f:
-                f.write(md)
-            md_files[str(i)] = md_path
-        print(f"▶️ MD 保存耗时：{time.time() - t_md_start:.2f} 秒")
-
-        # --- 测试图片保存耗时 ---
-        t_img_start = time.time()
-        for page_idx, images in self.images_content.items():
-            images_content_paths[str(page_idx)] = []
-            for j, img_array in enumerate(images):
-                img = Image.fromarray(img_array)
-                img_path = f"images/page_{page_idx+1}_{j}.png"
-                img.save(os.path.join(self.export_dir, img_path),format="PNG", compress_level=1)
-                images_content_paths[str(page_idx)].append(img_path)
-        print(f"▶️ 图片保存耗时：{time.time() - t_img_start:.2f} 秒")
-
-        # --- 测试 JSON 写入耗时 ---
-        record = {
-            "pdf_path": self.pdf_path,
-            "current_page": self.current_page,
-            "md_files": md_files,
-            "images_content": images_content_paths,
-            "image_descriptions": self.image_descriptions
-        }
-        t_json_start = time.time()
-        with open(os.path.join(self.export_dir, "record.json"), "w", encoding="utf-8") as f:
-            json.dump(record, f, ensure_ascii=False, indent=2)
-        print(f"▶️ JSON 写入耗时：{time.time() - t_json_start:.2f} 秒")
+        self._write_record(self.dirty_md_pages, self.dirty_image_pages, self.dirty_desc_pages)
+
+    def _write_record(self, md_pages, image_pages, desc_pages):
+        # 只在界面线程做快照并提交，PNG 编码与写文件在后台线程完成
+        submit_record(
+            self.record_writer, self.store, self.pdf_path, self.current_page, self.md_content,
+            self.images_content, self.image_descriptions, md_pages=md_pages, image_pages=image_pages,
+            desc_pages=desc_pages,
+            on_figures_saved=lambda page, figures, ids, store=self.store:
+                self.communication_queue.put(("figures_saved", (store, page, figures, ids)))
+        )
+        self.dirty_md_pages = set()
+        self.dirty_image_pages = set()
+        self.dirty_desc_pages = set()
+        self.record_dirty = False
+        self.saved_page = self.current_page
 
 
     def reset_state(self):
@@ -393,9 +433,23 @@ class PDFCleanerGUI:
         self.current_page = 0
         self.zoom_factor = 1.0
         self.md_text.delete(1.0, tk.END)
+        self.processing_token += 1
+        if self.processing_cancel is not None:
+            self.processing_cancel.set()
+            self.processing_cancel = None
+        self.stop_btn.config(state=tk.DISABLED)
+        self.pending_pages = set()
+        self.cancel_view_jobs()
         self.pdf_canvas.delete("all")
+        self.canvas_image_id = None
+        self.page_view = None
         self.images_content = {}
         self.image_descriptions = {}
+        self.dirty_md_pages = set()
+        self.dirty_image_pages = set()
+        self.dirty_desc_pages = set()
+        self.record_dirty = False
+        self.saved_page = 0
         if hasattr(self, "capture_btn"):
             self.capture_btn.config(state=tk.DISABLED)  # NEW
 
@@ -457,6 +511,8 @@ class PDFCleanerGUI:
                 # 追加到当前页
                 self.images_content.setdefault(self.current_page, []).append(arr)
                 self.image_descriptions.setdefault(self.current_page, []).append("")
+                self.dirty_image_pages.add(self.current_page)
+                self.record_dirty = True
 
                 # 保存记录并刷新 UI
                 self.save_to_record()
@@ -490,55 +546,167 @@ class PDFCleanerGUI:
         self.capture_btn.config(state=tk.NORMAL)  # NEW
 
 
-    def start_processing(self):
-        manager = multiprocessing.Manager()
-        return_dict = manager.dict()
+    def start_extraction(self, pages):
+        self.processing_cancel = multiprocessing.Event()
+        self.stop_btn.config(state=tk.NORMAL)
+        # 处理期间未完成的页面还是空白，完成或停止后才能导出
+        self.export_btn.config(state=tk.DISABLED)
+        threading.Thread(target=self.start_processing,
+                         args=(self.pdf_path, self.export_dir, self.processing_token, list(pages),
+                               self.processing_cancel),
+                         daemon=True).start()
+
+    def stop_processing(self):
+        """停止处理：已完成的页面已写入项目存储，重新导入时从未完成的页面继续"""
+        if self.processing_cancel is not None:
+            self.processing_cancel.set()
+            self.stop_btn.config(state=tk.DISABLED)
+            self.status_var.set("正在停止处理...")
+
+    def start_processing(self, pdf_path, export_dir, token, pages, cancel):
+        """
+        后台线程：阻塞等待处理进程的消息，每页结果到达即转交界面线程；
+        切换到其他文档（token 变化）后通知处理进程停止，不再转交结果。
+        """
+        # parse 依赖 OpenCV / PyMuPDF 等重量级模块，用到时才导入
+        from parse import extract_pdf
         process_queue = multiprocessing.Queue()
+        # 图像经溢出文件传递，消息中只有句柄
+        spill_dir = os.path.join(export_dir, ".spill")
+        cleanup_spill(spill_dir)
         process = multiprocessing.Process(
             target=extract_pdf,
-            args=(self.pdf_path, return_dict, process_queue)
+            args=(pdf_path, process_queue),
+            kwargs={"spill_dir": spill_dir, "pages": pages, "cancel": cancel}
         )
         process.start()
-        while process.is_alive():
-            if not process_queue.empty():
-                msg_type, data = process_queue.get()
-                if msg_type == "progress":
-                    self.communication_queue.put(("progress", data))
-                elif msg_type == "done":
-                    self.communication_queue.put(("done", return_dict.copy()))
-                    return
-                elif msg_type == "error":
-                    self.communication_queue.put(("error", data))
+        try:
+            while True:
+                current = token == self.processing_token
+                if not current:
+                    cancel.set()
+                try:
+                    msg_type, data = process_queue.get(timeout=0.5)
+                except queue.Empty:
+                    if not process.is_alive():
+                        if current:
+                            self.communication_queue.put(("error", "处理进程意外退出，已完成的页面已保存，重新导入可继续处理"))
+                        return
+                    continue
+                if msg_type == "page" and current:
+                    i, text, images, legends = data
+                    # 溢出文件的映射在此线程打开，界面线程只做赋值
+                    self.communication_queue.put(("page", (token, i, text, load_arrays(images), legends)))
+                elif msg_type in ("done", "error", "cancelled"):
+                    if current:
+                        self.communication_queue.put((msg_type, data))
                     return
-        if not process_queue.empty():
-            msg_type, data = process_queue.get()
-            self.communication_queue.put((msg_type, data))
+        finally:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    def on_page_processed(self, token, i, text, images, legends):
+        """一页处理完成：写入 md_content / images_content，正在查看该页时立即刷新"""
+        if token != self.processing_token or i >= len(self.md_content):
+            return
+        self.pending_pages.discard(i)
+        self.md_content[i] = text
+        if images:
+            # 提取结果替换该页原有的图像，只保留本次会话处理期间截取的图像（排在提取结果之后）
+            self.images_content[i] = list(images) + self.images_content.get(i, [])
+            self.image_descriptions[i] = [f"{legend}" for legend in legends] + self.image_descriptions.get(i, [])
+        # 检查点：本页结果立即交给后台写盘，中途关闭或崩溃后可从未完成的页面继续
+        submit_page_result(
+            self.record_writer, self.store, i, text, self.images_content.get(i, []),
+            self.image_descriptions.get(i, []),
+            on_figures_saved=lambda page, figures, ids, store=self.store:
+                self.communication_queue.put(("figures_saved", (store, page, figures, ids)))
+        )
+        self.update_processing_progress()
+        if i == self.current_page:
+            self.display_markdown_content()
+            self.display_image()
+
+    def update_processing_progress(self):
+        done = self.total_pages - len(self.pending_pages)
+        self.progress_var.set(int(done / max(self.total_pages, 1) * 100))
+        self.status_var.set(f"处理中... {done}/{self.total_pages} 页")
+
+    def finish_processing(self):
+        self.processing_cancel = None
+        self.stop_btn.config(state=tk.DISABLED)
+        self.export_btn.config(state=tk.NORMAL)
+        if self.store:
+            # 排在已提交的图像写入之后：届时各页图像已换成 FigureRef，溢出文件不再需要
+            self.record_writer.submit(
+                (self.store.path, "release_spill"), self.communication_queue.put,
+                ("spill_released", (self.store, os.path.join(self.export_dir, ".spill"))))
+
+    def show_processing_stats(self, stats):
+        """处理完成：各 OCR 后端的调用次数、延迟与吞吐，渲染像素与节省的耗时，写入日志并显示在状态栏"""
+        from parse import format_page_stats  # 处理线程已导入 parse
+        lines = format_page_stats(stats)
+        for line in lines:
+            print(line)
+        self.status_var.set("；".join(["处理完成!"] + lines))
+
+    def release_spill(self, store, spill_dir):
+        if store is not self.store:
+            return
+        # 写入失败的页面仍引用溢出文件，保留到下次处理开始时再清理
+        if any(isinstance(fig, np.memmap) for figs in self.images_content.values() for fig in figs):
+            return
+        cleanup_spill(spill_dir)
 
     def check_processing_queue(self):
         try:
             while True:
                 msg_type, data = self.communication_queue.get_nowait()
-                if msg_type == "progress":
-                    self.progress_var.set(data)
-                    self.status_var.set(f"处理中... {data}%")
+                if msg_type == "md_preview":
+                    self.apply_md_preview(*data)
+                elif msg_type == "thumbnails":
+                    token, thumbs, descriptions = data
+                    if token == self.thumb_token:
+                        # PhotoImage 只能在界面线程创建
+                        self.render_images([(idx, ImageTk.PhotoImage(img) if img is not None else None)
+                                            for idx, img in thumbs], descriptions)
+                elif msg_type == "spill_released":
+                    self.release_spill(*data)
+                elif msg_type == "figures_saved":
+                    self.replace_saved_figures(*data)
+                elif msg_type == "save_progress":
+                    # 单个任务（翻页保存）不打扰状态栏，批量写入时显示进度
+                    done, total = data
+                    if total > 1:
+                        self.status_var.set("记录已保存" if done >= total else f"正在保存记录... {done}/{total}")
+                elif msg_type == "export_progress":
+                    done, total = data
+                    self.progress_var.set(int(done / total * 100))
+                    self.status_var.set(f"正在导出图像... {done}/{total}")
+                elif msg_type == "export_done":
+                    self.on_export_finished(*data)
+                elif msg_type == "export_error":
+                    self.export_cancel = None
+                    self.export_btn.config(text="导出")
+                    messagebox.showerror("导出错误", f"无法保存文件:\n{data}")
+                elif msg_type == "page":
+                    self.on_page_processed(*data)
                 elif msg_type == "done":
-                    self.text_map = data["text"]
-                    self.images_map = data["images"]
-                    self.legends_map= data["legends"]
-                    self.md_content = [self.text_map[i] for i in sorted(self.text_map.keys())]
-                    self.images_content = {
-                        i: self.images_map[i]
-                        for i in sorted(self.images_map.keys())
-                    }
-                    for i in sorted(self.images_map.keys()):
-                        self.image_descriptions[i] = [f"{self.legends_map[i][j]}" for j in range(len(self.images_map[i]))]
-
-                    self.init_record()
-                    self.display_page(0)
+                    # 各页结果已逐页写入；处理期间的编辑随 save_to_record 写入
+                    self.finish_processing()
+                    submit_extraction_done(self.record_writer, self.store)
+                    self.commit_current_page()
+                    self.save_to_record()
                     self.progress_var.set(100)
-                    self.status_var.set("处理完成!")
-                    self.export_btn.config(state=tk.NORMAL)
+                    self.show_processing_stats(data.get("stats", {}))
+                elif msg_type == "cancelled":
+                    self.finish_processing()
+                    self.status_var.set(f"已停止处理：完成 {self.total_pages - len(self.pending_pages)}/"
+                                        f"{self.total_pages} 页，重新导入可继续")
                 elif msg_type == "error":
+                    self.finish_processing()
                     messagebox.showerror("处理错误", data)
                     self.status_var.set("处理失败")
                     self.progress_var.set(0)
@@ -547,45 +715,135 @@ class PDFCleanerGUI:
         finally:
             self.root.after(100, self.check_processing_queue)
 
+    def replace_saved_figures(self, store, page, figures, ids):
+        """图像写入项目存储后，把内存中的数组换成 FigureRef，由 LRU 缓存控制常驻内存"""
+        if store is not self.store:
+            return
+        current = self.images_content.get(page, [])
+        cache = get_figure_cache()
+        for fig, fid in zip(figures, ids):
+            if isinstance(fig, FigureRef):
+                continue
+            for k, item in enumerate(current):
+                if item is fig:
+                    current[k] = FigureRef(store, fid, fig.shape[1], fig.shape[0])
+                    if not isinstance(fig, np.memmap):
+                        cache.put((store.path, fid), fig)
+                    break
+
     def display_page(self, page_num):
         if not self.pdf_document or page_num >= self.total_pages:
             return
         self.current_page = page_num
-        page = self.pdf_document.load_page(page_num)
-        zoom_matrix = fitz.Matrix(self.zoom_factor, self.zoom_factor)
-        pix = page.get_pixmap(matrix=zoom_matrix)
         try:
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            self.photo_image = ImageTk.PhotoImage(img)
+            self.render_view()
         except Exception as e:
             messagebox.showerror("图像错误", f"无法加载图像: {str(e)}")
             return
-        self.center_image_on_canvas(pix.width, pix.height)
         self.display_markdown_content()
         self.display_image()
         self.page_var.set(f"{page_num + 1}/{self.total_pages}")
         self.update_navigation_buttons()
 
-    def center_image_on_canvas(self, img_width, img_height):
-        canvas_width = self.pdf_canvas.winfo_width()
-        canvas_height = self.pdf_canvas.winfo_height()
-        x_pos = canvas_width // 2
-        y_pos = canvas_height // 2
-
-        # 复用canvas上的图片item
+    def cancel_view_jobs(self):
+        for job in (self.zoom_job, self.view_job):
+            if job is not None:
+                self.root.after_cancel(job)
+        self.zoom_job = self.view_job = None
+
+    def render_view(self):
+        """按当前缩放清晰渲染：整页不大时整页渲染并走缓存，否则只渲染可见区域（含边距）"""
+        self.cancel_view_jobs()
+        page = self.pdf_document.load_page(self.current_page)
+        zoom = self.zoom_factor
+        self.page_size = (page.rect.width, page.rect.height)
+        width, height = self.page_size[0] * zoom, self.page_size[1] * zoom
+        self.layout_page(width, height)
+        # 旋转页面的 clip 坐标与显示坐标不一致，始终整页渲染
+        if width * height <= CLIP_RENDER_PIXELS or page.rotation:
+            # 翻页、缩放后回到已看过的页面都直接取缓存，相邻页通常已由预渲染线程放入
+            img = self.page_cache.get_page(self.pdf_document, self.current_page, zoom)
+            x0 = y0 = 0
+            if self.prefetcher:
+                self.prefetcher.request_neighbors(self.current_page, zoom, self.total_pages)
+        else:
+            vx0, vy0, vx1, vy1 = self.visible_page_rect()
+            mx, my = (vx1 - vx0) * CLIP_MARGIN, (vy1 - vy0) * CLIP_MARGIN
+            x0, y0 = int(max(0, vx0 - mx)), int(max(0, vy0 - my))
+            x1, y1 = int(min(width, vx1 + mx)) + 1, int(min(height, vy1 + my)) + 1
+            img = render_page_image(self.pdf_document, self.current_page, zoom,
+                                    clip=(x0 / zoom, y0 / zoom, x1 / zoom, y1 / zoom))
+        self.page_view = {"zoom": zoom, "image": img, "box": (x0, y0, x0 + img.width, y0 + img.height),
+                          "clipped": (img.width, img.height) != (round(width), round(height))}
+        self.show_page_image(img, x0, y0)
+        # 上面调整滚动区域时触发的重绘请求已过时
+        self.cancel_view_jobs()
+
+    def layout_page(self, width, height):
+        """页面小于画布时居中，否则从画布原点开始；滚动区域覆盖整页"""
+        canvas_width = max(self.pdf_canvas.winfo_width(), 1)
+        canvas_height = max(self.pdf_canvas.winfo_height(), 1)
+        self.page_origin = (max(0, (canvas_width - width) // 2), max(0, (canvas_height - height) // 2))
+        self.pdf_canvas.config(scrollregion=(0, 0, max(width, canvas_width), max(height, canvas_height)))
+
+    def visible_page_rect(self):
+        """画布可见区域在（当前缩放下）页面像素坐标中的范围"""
+        ox, oy = self.page_origin
+        canvas = self.pdf_canvas
+        return (canvas.canvasx(0) - ox, canvas.canvasy(0) - oy,
+                canvas.canvasx(canvas.winfo_width()) - ox, canvas.canvasy(canvas.winfo_height()) - oy)
+
+    def show_page_image(self, img, x, y):
+        """把位图放在页面像素坐标 (x, y) 处，复用 canvas 上的图片 item"""
+        self.photo_image = ImageTk.PhotoImage(img)
+        pos = (self.page_origin[0] + x, self.page_origin[1] + y)
         if self.canvas_image_id is None:
-            self.canvas_image_id = self.pdf_canvas.create_image(
-                x_pos, y_pos, anchor=tk.CENTER, image=self.photo_image
-            )
+            self.canvas_image_id = self.pdf_canvas.create_image(*pos, anchor=tk.NW, image=self.photo_image)
         else:
-            self.pdf_canvas.coords(self.canvas_image_id, x_pos, y_pos)
+            self.pdf_canvas.coords(self.canvas_image_id, *pos)
             self.pdf_canvas.itemconfig(self.canvas_image_id, image=self.photo_image)
 
-        self.pdf_canvas.config(scrollregion=(0, 0, img_width, img_height))
+    def preview_zoom(self):
+        """缩放过程中的预览：把上一次清晰渲染的位图中可见的部分直接缩放，开销只与画布大小有关"""
+        view = self.page_view
+        scale = self.zoom_factor / view["zoom"]
+        width, height = self.page_size[0] * self.zoom_factor, self.page_size[1] * self.zoom_factor
+        vx0, vy0, vx1, vy1 = self.visible_page_rect()
+        bx0, by0, bx1, by1 = view["box"]
+        # 可见区域映射回清晰位图的像素坐标，并限制在位图范围内
+        left, top = max(max(vx0, 0) / scale, bx0), max(max(vy0, 0) / scale, by0)
+        right, bottom = min(min(vx1, width) / scale, bx1), min(min(vy1, height) / scale, by1)
+        if right - left < 1 or bottom - top < 1:
+            return
+        crop = (int(left - bx0), int(top - by0), int(right - bx0 + 0.999), int(bottom - by0 + 0.999))
+        size = (max(1, round((crop[2] - crop[0]) * scale)), max(1, round((crop[3] - crop[1]) * scale)))
+        preview = view["image"].crop(crop).resize(size, Image.BILINEAR)
+        self.show_page_image(preview, (crop[0] + bx0) * scale, (crop[1] + by0) * scale)
+
+    def on_view_changed(self):
+        """滚动或改变窗口大小后，可见区域超出已渲染的局部位图时重新渲染（合并连续的滚动）"""
+        view = self.page_view
+        if not view or not view["clipped"] or self.zoom_job is not None:
+            return
+        vx0, vy0, vx1, vy1 = self.visible_page_rect()
+        width, height = self.page_size[0] * view["zoom"], self.page_size[1] * view["zoom"]
+        bx0, by0, bx1, by1 = view["box"]
+        if (max(vx0, 0) >= bx0 and max(vy0, 0) >= by0
+                and min(vx1, width) <= bx1 + 1 and min(vy1, height) <= by1 + 1):
+            return
+        if self.view_job is not None:
+            self.root.after_cancel(self.view_job)
+        self.view_job = self.root.after(50, self.render_view)
 
     def display_markdown_content(self):
         self.md_text.config(state=tk.NORMAL)
         self.md_text.delete(1.0, tk.END)
+        if self.current_page in self.pending_pages:
+            # 结果到达前不可编辑，避免编辑内容被处理结果覆盖
+            self.md_text.insert(tk.END, f"第 {self.current_page + 1} 页正在处理...")
+            self.md_text.edit_reset()
+            self.md_text.config(state=tk.DISABLED)
+            return
         if self.current_page < len(self.md_content):
             content = self.md_content[self.current_page]
             self.md_text.insert(tk.END, content)
@@ -613,21 +871,24 @@ class PDFCleanerGUI:
         self.photo_image_refs = []
         self.image_desc_entries = []
 
-        def load_images_in_thread():
-            rendered_images = []
-            for idx, img_array in enumerate(images):
-                try:
-                    img = Image.fromarray(img_array)
-                    img_resized = img.resize((200, 200), resample=Image.Resampling.LANCZOS)
-                    tk_img = ImageTk.PhotoImage(img_resized)
-                    rendered_images.append((idx, tk_img))
-                except Exception as e:
-                    rendered_images.append((idx, None))
-            self.root.after(0, lambda: self.render_images(rendered_images, descriptions))
-
-        threading.Thread(target=load_images_in_thread, daemon=True).start()
+        self.thumb_token += 1
+        self.thumb_requests.put((self.thumb_token, list(images), descriptions))
         self.status_var.set("正在加载图像...")
 
+    def load_thumbnails(self):
+        """后台线程：缩略图来自内存缓存或项目存储，不解码原图；结果经 communication_queue 交回界面线程"""
+        while True:
+            token, images, descriptions = self.thumb_requests.get()
+            if token != self.thumb_token:
+                continue  # 已翻到其他页
+            thumbs = []
+            for idx, figure in enumerate(images):
+                try:
+                    thumbs.append((idx, thumbnail(figure)))
+                except Exception:
+                    thumbs.append((idx, None))
+            self.communication_queue.put(("thumbnails", (token, thumbs, descriptions)))
+
     def render_images(self, rendered_images, descriptions):
         """在主线程中更新UI"""
         for idx, tk_img in rendered_images:
@@ -664,34 +925,65 @@ class PDFCleanerGUI:
             # 删除图片文件记录
             del self.images_content[self.current_page][index]
             del self.image_descriptions[self.current_page][index]
+            self.dirty_image_pages.add(self.current_page)
+            self.record_dirty = True
             self.save_to_record()
             self.display_image()
 
-    def save_current_image_descriptions(self):
+    def collect_image_descriptions(self):
+        """把描述输入框的内容收回 image_descriptions，有变化时标记为脏"""
         if not hasattr(self, "image_desc_entries") or not self.image_desc_entries:
-            print("⚠️ 当前页面图像尚未加载完毕，跳过描述保存")
             return
         if self.current_page in self.image_descriptions:
-            self.image_descriptions[self.current_page] = [
-                var.get() for var in self.image_desc_entries
-            ]
-            self.save_to_record()
-
-    def save_markdown_content(self):
-        if self.current_page < len(self.md_content):
-            self.md_content[self.current_page] = self.md_text.get(1.0, tk.END).strip()
-            self.save_to_record()
+            descriptions = [var.get() for var in self.image_desc_entries]
+            if descriptions != self.image_descriptions[self.current_page]:
+                self.image_descriptions[self.current_page] = descriptions
+                self.dirty_desc_pages.add(self.current_page)
+
+    def collect_markdown_content(self):
+        """把编辑器内容收回 md_content，有变化时标记该页为脏"""
+        if self.current_page < len(self.md_content) and self.current_page not in self.pending_pages:
+            content = self.md_text.get(1.0, tk.END).strip()
+            if content != self.md_content[self.current_page]:
+                self.md_content[self.current_page] = content
+                self.dirty_md_pages.add(self.current_page)
+
+    def commit_current_page(self):
+        self.collect_image_descriptions()
+        self.collect_markdown_content()
+
+    def save_current_page(self):
+        """翻页 / 导出前保存当前页：两处改动合并为一次写入，未编辑时不写盘"""
+        self.commit_current_page()
+        self.save_to_record()
 
     def on_mousewheel(self, event):
-        if self.pdf_document:
-            delta = event.delta
-            if event.num == 5 or event.delta < 0:
-                scale = 0.9
-            else:
-                scale = 1.1
-            self.zoom_factor *= scale
-            self.zoom_factor = max(0.5, min(self.zoom_factor, 3.0))
-            self.display_page(self.current_page)
+        """滚轮缩放：立即显示缩放后的旧位图，滚轮停下 ZOOM_SETTLE_MS 毫秒后再清晰渲染一次"""
+        if not self.pdf_document or not self.page_view:
+            return
+        if event.num == 5 or event.delta < 0:
+            scale = 0.9
+        else:
+            scale = 1.1
+        old_zoom = self.zoom_factor
+        new_zoom = max(0.5, min(old_zoom * scale, 3.0))
+        if new_zoom == old_zoom:
+            return
+        canvas = self.pdf_canvas
+        # 缩放前鼠标下的页面坐标（PDF 点），缩放后保持在鼠标下
+        ox, oy = self.page_origin
+        px = (canvas.canvasx(event.x) - ox) / old_zoom
+        py = (canvas.canvasy(event.y) - oy) / old_zoom
+        self.zoom_factor = new_zoom
+        width, height = self.page_size[0] * new_zoom, self.page_size[1] * new_zoom
+        self.layout_page(width, height)
+        ox, oy = self.page_origin
+        canvas.xview_moveto(max(0, ox + px * new_zoom - event.x) / max(width, canvas.winfo_width()))
+        canvas.yview_moveto(max(0, oy + py * new_zoom - event.y) / max(height, canvas.winfo_height()))
+        self.preview_zoom()
+        if self.zoom_job is not None:
+            self.root.after_cancel(self.zoom_job)
+        self.zoom_job = self.root.after(ZOOM_SETTLE_MS, self.render_view)
 
     def update_navigation_buttons(self):
         self.prev_btn.config(
@@ -703,22 +995,19 @@ class PDFCleanerGUI:
 
     def prev_page(self):
         if self.current_page > 0:
-            self.save_current_image_descriptions()
-            self.save_markdown_content()
+            self.save_current_page()
             self.display_page(self.current_page - 1)
 
     def next_page(self):
         if self.current_page < self.total_pages - 1:
-            self.save_current_image_descriptions()
-            self.save_markdown_content()
+            self.save_current_page()
             self.display_page(self.current_page + 1)
 
     def goto_page(self):
         try:
             page_num = int(self.goto_entry.get()) - 1
             if 0 <= page_num < self.total_pages:
-                self.save_current_image_descriptions()
-                self.save_markdown_content()
+                self.save_current_page()
                 self.display_page(page_num)
             else:
                 messagebox.showwarning(
@@ -729,13 +1018,19 @@ class PDFCleanerGUI:
             messagebox.showwarning("输入错误", "请输入有效的页码数字")
 
     def export(self):
-        """导出：合并Markdown文本 + 保留图像 + 图像描述 JSON"""
+        """导出：合并Markdown文本 + 保留图像 + 图像描述 JSON；导出进行中再次点击则取消"""
+        if self.export_cancel is not None:
+            self.export_cancel.set()
+            self.status_var.set("正在取消导出...")
+            return
         if not self.md_content:
             messagebox.showinfo("没有内容", "没有要导出的Markdown内容")
             return
+        if self.pending_pages and not messagebox.askyesno(
+                "尚未处理完成", f"还有 {len(self.pending_pages)} 页未处理，导出结果将缺少这些页面的内容。是否仍要导出？"):
+            return
 
-        self.save_markdown_content()
-        self.save_current_image_descriptions()
+        self.save_current_page()
 
         # 选择导出目录（不是文件）
         export_root = filedialog.askdirectory(title="选择导出目录")
@@ -748,56 +1043,84 @@ class PDFCleanerGUI:
             return
         pdf_name = os.path.splitext(os.path.basename(self.pdf_path))[0]
         export_folder = os.path.join(export_root, pdf_name)
-        image_folder = os.path.join(export_folder, "images")
-        os.makedirs(image_folder, exist_ok=True)
 
+        # 图像编码与写文件在后台线程进行，界面线程只做快照
+        self.export_cancel = threading.Event()
+        self.export_btn.config(text="取消导出")
+        self.status_var.set("正在导出...")
+        threading.Thread(
+            target=self.run_export,
+            args=(export_folder, list(self.md_content), {k: list(v) for k, v in self.images_content.items()},
+                  {k: list(v) for k, v in self.image_descriptions.items()}, self.export_cancel),
+            daemon=True
+        ).start()
+
+    def run_export(self, export_folder, md_content, images_content, image_descriptions, cancel):
+        store = self.store
         try:
-            description_map = {}
-            fig_count = 1
-            merged_md = ""
-            # 合并Markdown并插入图片引用
-            for page_idx, md in enumerate(self.md_content):
-                merged_md += md.strip() + "\n\n"
-                images = self.images_content.get(page_idx, [])
-                descriptions = self.image_descriptions.get(page_idx, [])
-                for i, img_array in enumerate(images):
-                    filename = f"fig{fig_count:03d}.png"
-                    desc = descriptions[i] if i < len(descriptions) else f"图 {fig_count}"
-                    img = Image.fromarray(img_array)
-                    img.save(os.path.join(image_folder, filename))
-                    description_map[filename] = desc
-                    fig_count += 1
-
-            # 写 Markdown 文件
-            md_path = os.path.join(export_folder, "export.md")
-            with open(md_path, "w", encoding="utf-8") as f:
-                f.write(merged_md.strip())
-
-            # 写 JSON 文件
-            json_path = os.path.join(export_folder, "image_descriptions.json")
-            with open(json_path, "w", encoding="utf-8") as jf:
-                json.dump(description_map, jf, ensure_ascii=False, indent=2)
-
-            messagebox.showinfo("导出成功", f"已导出到:\n{export_folder}\n图像数量: {fig_count-1}")
-            self.status_var.set(f"导出成功: {os.path.basename(md_path)}")
-
+            md_path, fig_total = export_markdown(
+                export_folder, md_content, images_content, image_descriptions, cancel=cancel,
+                on_progress=lambda done, total: self.communication_queue.put(("export_progress", (done, total)))
+            )
+            self.communication_queue.put(("export_done", (export_folder, md_path, fig_total)))
         except Exception as e:
-            messagebox.showerror("导出错误", f"无法保存文件:\n{str(e)}")
+            self.communication_queue.put(("export_error", str(e)))
+        finally:
+            if store:
+                store.release_thread()
+
+    def on_export_finished(self, export_folder, md_path, fig_total):
+        self.export_cancel = None
+        self.export_btn.config(text="导出")
+        if md_path is None:
+            self.status_var.set(f"导出已取消（已写出 {fig_total} 张图像）")
+            return
+        metrics.write("gui")
+        self.progress_var.set(100)
+        messagebox.showinfo("导出成功", f"已导出到:\n{export_folder}\n图像数量: {fig_total}")
+        self.status_var.set(f"导出成功: {os.path.basename(md_path)}")
+
+    def on_tab_changed(self, event=None):
+        """首次切换到预览页时创建预览控件并渲染当前内容"""
+        if self.notebook.select() != str(self.preview_tab):
+            return
+        if self.preview_html_label is None:
+            from tkhtmlview import HTMLLabel
+            self.preview_html_label = HTMLLabel(self.preview_tab, html="", background="white", width=100)
+            self.preview_html_label.pack(fill=tk.BOTH, expand=True)
+        self.update_md_preview()
+
+    def preview_visible(self):
+        return self.preview_html_label is not None and self.notebook.select() == str(self.preview_tab)
 
     def update_md_preview(self):
-        """更新Markdown渲染预览"""
-        try:
-            raw_md = self.md_text.get(1.0, tk.END)
-            html = markdown.markdown(raw_md)
-            self.preview_html_label.set_html(html)
-            self.status_var.set("Markdown渲染成功")
-        except Exception as e:
-            self.status_var.set(f"渲染失败: {str(e)}")
+        """把当前文本交给后台线程转换；预览页不可见时跳过，切换到预览页时再渲染"""
+        if self.preview_job is not None:
+            self.root.after_cancel(self.preview_job)
+            self.preview_job = None
+        if not self.preview_visible():
+            return
+        self.md_renderer.submit(self.md_text.get(1.0, tk.END))
 
+    def apply_md_preview(self, generation, html, error):
+        """界面线程：只显示最新一次提交的结果，内容未变时不重设控件"""
+        if not self.md_renderer.is_current(generation) or not self.preview_visible():
+            return
+        if error is not None:
+            self.status_var.set(f"渲染失败: {str(error)}")
+            return
+        if html != self.preview_html:
+            self.preview_html_label.set_html(html)
+            self.preview_html = html
+        self.status_var.set("Markdown渲染成功")
 
     def on_md_modified(self, event=None):
-        """每当Markdown文本修改时自动刷新预览"""
+        """Markdown文本修改后，停止输入 PREVIEW_DELAY_MS 毫秒再刷新预览"""
         if self.md_text.edit_modified():  # 确保是用户输入引起的变化
-            self.update_md_preview()
             self.md_text.edit_modified(False)  # 重置修改标志
+            if self.preview_job is not None:
+                self.root.after_cancel(self.preview_job)
+                self.preview_job = None
+            if self.preview_visible():
+                self.preview_job = self.root.after(PREVIEW_DELAY_MS, self.update_md_preview)
 
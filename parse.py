@@ -1,51 +1,247 @@
 import fitz  # PyMuPDF
 from PIL import Image
 import numpy as np
+import os
+import time
 import multiprocessing
-from utils.clean_data import clean_text
-from utils.extract_txt import baidu_ocr_image
-from utils.extract_imgs import extract_image
+from utils.ocr_client import DEFAULT_QPS
+from utils.clean_data import clean_text, DEFAULT_PROFILE
+from utils.extract_txt import baidu_ocr_image, get_client
+from utils.ocr_backends import set_backend, get_backend, merge_stats, format_stats
+from utils.extract_imgs import (extract_image, extract_embedded_images, detect_figures,
+                                legend_from_text_layer)
+from utils.transport import write_arrays
+from utils.ocr_cache import pop_cache_counts
+from utils import metrics
+from utils.resolution import (choose_dpi, baseline_pixels, new_render_stats,
+                              merge_render_stats, format_render_stats)
 
-def process_page(args):
-    i, page_bytes, page_text, dpi = args
-    img = np.frombuffer(page_bytes[0], dtype=np.uint8).reshape(page_bytes[1])
+# 每个工作进程各自持有的已打开文档（路径 -> fitz.Document），每个进程只打开一次
+_worker_docs = {}
+# 批量处理多个文档时，每个工作进程最多保持打开的文档数
+MAX_WORKER_DOCS = 4
+# 文字层页面优先直接提取嵌入图像（PDF2MD_EMBEDDED_IMAGES=0 关闭，始终整页渲染检测）
+EMBEDDED_IMAGES = os.environ.get("PDF2MD_EMBEDDED_IMAGES", "1") != "0"
+# 本进程的渲染统计，随每页结果取出并清零
+_render_stats = new_render_stats()
+
+
+def _open_worker_doc(path):
+    doc = _worker_docs.get(path)
+    if doc is None:
+        while len(_worker_docs) >= MAX_WORKER_DOCS:
+            # 关闭最早打开的文档
+            _worker_docs.pop(next(iter(_worker_docs))).close()
+        doc = fitz.open(path)
+        _worker_docs[path] = doc
+    return doc
+
+
+def _init_worker(path=None, processes=1, ocr_backend=None):
+    """进程池初始化：选择 OCR 后端、预先打开PDF，并按进程数均分 OCR 的 QPS 配额"""
+    backend = set_backend(ocr_backend) if ocr_backend else get_backend()
+    if backend.name == "baidu":
+        get_client().set_qps(DEFAULT_QPS / max(1, processes))
+    if path:
+        _open_worker_doc(path)
+    # fork 出的进程继承了父进程尚未写出的 trace 记录，丢弃，避免随第一页结果重复送回
+    metrics.pop()
 
+
+def render_page(page, dpi, clip=None):
+    """将页面（或 clip 区域）渲染为 numpy 数组 (H, W, C)，并计入渲染统计"""
+    t0 = time.perf_counter()
+    with metrics.span("render", dpi=dpi, clip=clip is not None):
+        pix = page.get_pixmap(dpi=dpi, clip=clip)
+    _render_stats["renders"] += 1
+    _render_stats["pixels"] += pix.width * pix.height
+    _render_stats["seconds"] += time.perf_counter() - t0
+    metrics.count("pixels_rendered", pix.width * pix.height)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+
+def _process_raster(i, img, page_text, spill_dir=None, scale=1.0, profile=DEFAULT_PROFILE):
     if page_text:
-        text = clean_text(page_text)
-        images,legends = extract_image(img, "output", i)
+        text = clean_text(page_text, profile)
+        images,legends = extract_image(img, "output", i, scale=scale)
     else:
-        text = clean_text(baidu_ocr_image(img))
-        images,legends = extract_image(img, "output", i)
+        text = clean_text(baidu_ocr_image(img), profile)
+        images,legends = extract_image(img, "output", i, scale=scale)
+
+    return _page_result(i, text, images, legends, spill_dir)
+
+
+def _page_result(i, text, images, legends, spill_dir=None):
+    global _render_stats
+    if spill_dir:
+        # 图像写入溢出文件，只返回句柄
+        images = write_arrays(images, spill_dir, f"page_{i+1}")
+    # 附带本页的统计：OCR 后端（调用次数、耗时、像素数）与渲染（像素数、耗时）
+    stats = {"ocr": get_backend().pop_stats(), "render": _render_stats, "ocr_cache": pop_cache_counts()}
+    _render_stats = new_render_stats()
+    return i, text, images,legends, stats
+
+
+def _attach_metrics(result):
+    # 开启记录时，工作进程的 trace 事件与计数器随结果送回父进程（须在 page 区间结束后取出）
+    if metrics.enabled():
+        result[4]["metrics"] = metrics.pop()
+    return result
+
+
+def merge_page_stats(total, stats):
+    """累加各页返回的统计"""
+    merge_stats(total.setdefault("ocr", {}), stats.get("ocr", {}))
+    merge_render_stats(total.setdefault("render", new_render_stats()), stats.get("render", {}))
+    cache = total.setdefault("ocr_cache", {"hits": 0, "misses": 0})
+    for k, v in stats.get("ocr_cache", {}).items():
+        cache[k] += v
+    return total
+
+
+def collect_metrics(stats, submitted=None):
+    """父进程取出每页结果中附带的 trace 记录并合并（merge_page_stats 之前调用）"""
+    metrics.merge(stats.pop("metrics", None), submitted)
 
-    return i, text, images,legends
 
-def extract_pdf(path, return_dict, queue, dpi=300):
+def format_page_stats(total, dpi=300):
+    lines = format_stats(total.get("ocr", {})) + [format_render_stats(total.get("render", {}), dpi)]
+    cache = total.get("ocr_cache", {})
+    if cache.get("hits") or cache.get("misses"):
+        lines.append(f"OCR 缓存: 命中 {cache['hits']} 次, 未命中 {cache['misses']} 次")
+    return lines
+
+
+def _extract_text_page_figures(page, i, dpi):
+    """
+    文字层页面（含矢量图）：以检测分辨率渲染整页找图形位置，
+    再只按裁剪分辨率渲染各图形区域；图例取文字层，不调用 OCR。
+    """
+    detect_dpi = choose_dpi(page.rect, "detect", True, dpi)
+    crop_dpi = choose_dpi(page.rect, "crop", True, dpi)
+    img = render_page(page, detect_dpi)
+    scale = detect_dpi / 72
+    figures, legends = [], []
+    for x, y, w, h in detect_figures(img, scale=detect_dpi / dpi):
+        # 向外多取一个检测像素，避免换算误差裁掉边缘
+        rect = fitz.Rect((x - 1) / scale, (y - 1) / scale, (x + w + 1) / scale, (y + h + 1) / scale) & page.rect
+        figures.append(render_page(page, crop_dpi, clip=rect)[:, :, :3])
+        legends.append(legend_from_text_layer(page, rect, dpi))
+    print(f"✅ 第 {i+1} 页提取 {len(figures)} 个图形及图例")
+    return figures, legends
+
+
+def process_page(args):
+    i, page_bytes, page_text, dpi, spill_dir, profile = args
+    with metrics.span("page", page=i):
+        img = np.frombuffer(page_bytes[0], dtype=np.uint8).reshape(page_bytes[1])
+        result = _process_raster(i, img, page_text, spill_dir, profile=profile)
+    return _attach_metrics(result)
+
+
+def _has_page_image(page):
+    """页面上是否有图像（带文字层的扫描页需要整页分辨率检测）"""
+    return bool(page.get_image_info())
+
+
+def process_page_index(args):
+    """在工作进程内渲染并处理指定页，父进程只传递页码；args = (路径, 页码, dpi, spill_dir, 清洗配置)"""
+    path, i, dpi, spill_dir, profile = args
+    with metrics.span("page", page=i, doc=os.path.basename(path)):
+        result = _process_page_index(path, i, dpi, spill_dir, profile)
+    return _attach_metrics(result)
+
+
+def _process_page_index(path, i, dpi, spill_dir, profile):
+    page = _open_worker_doc(path).load_page(i)
+    _render_stats["pages"] += 1
+    _render_stats["baseline_pixels"] += baseline_pixels(page.rect, dpi)
+    text = page.get_text().strip()
+    if text:
+        if EMBEDDED_IMAGES:
+            # 文字层页面：直接取嵌入图像，含矢量图或为扫描页时才回退到渲染检测
+            embedded = extract_embedded_images(page, i, dpi)
+            if embedded is not None:
+                images, legends = embedded
+                return _page_result(i, clean_text(text, profile), images, legends, spill_dir)
+        if not _has_page_image(page):
+            images, legends = _extract_text_page_figures(page, i, dpi)
+            return _page_result(i, clean_text(text, profile), images, legends, spill_dir)
+    # 扫描页：按 OCR 后端的限制选择分辨率，检测与图例裁剪复用同一张渲染图
+    ocr_dpi = choose_dpi(page.rect, "ocr", bool(text), dpi, get_backend().max_side)
+    img = render_page(page, ocr_dpi)
+    return _process_raster(i, img, text, spill_dir, scale=ocr_dpi / dpi, profile=profile)
+
+
+def extract_pdf(path, queue, dpi=300, render_in_worker=True, spill_dir=None, ocr_backend=None,
+                pages=None, cancel=None, profile=DEFAULT_PROFILE):
+    """
+    每页处理完成即向 queue 发送 ("page", (页码, 文字, 图像, 图例)) 与 ("progress", 百分比)，
+    全部完成后发送 ("done", {"stats": 各页统计汇总，可用 format_page_stats 格式化})，出错时发送 ("error", 信息)。
+    pages 为需要处理的页码（续传时跳过已完成的页面），None 表示全部。
+    cancel（multiprocessing.Event）被设置后终止进程池，发送 ("cancelled", 已完成页数)。
+    render_in_worker=True 时由各工作进程自行打开PDF并渲染分配到的页面，
+    父进程不再预先渲染整本文档；False 时保持原有的父进程预渲染方式。
+    spill_dir 不为空时，图像经溢出文件传递，消息中的图像是句柄
+    （见 utils.transport），需用 load_arrays 取回。
+    ocr_backend 为 OCR 后端名（baidu / tesseract / fake），为空时使用 OCR_BACKEND 环境变量。
+    profile 为文本清洗配置名（见 utils.clean_data.register_rule），须在启动前注册，工作进程随 fork 继承。
+    """
+    try:
+        _extract_pdf(path, queue, dpi, render_in_worker, spill_dir, ocr_backend, pages, cancel, profile)
+    except Exception as e:
+        queue.put(("error", f"处理失败: {e}"))
+
+
+def _extract_pdf(path, queue, dpi, render_in_worker, spill_dir, ocr_backend, pages, cancel, profile):
+    t_start = time.time()
     doc = fitz.open(path)
-    total_pages = len(doc)
+    if pages is None:
+        pages = range(len(doc))
+    total_pages = len(pages)
 
     # 准备任务参数
-    tasks = []
-    for i, page in enumerate(doc):
-        text = page.get_text().strip()
-        pix = page.get_pixmap(dpi=dpi)
-        img_array = np.frombuffer(pix.samples, dtype=np.uint8)
-        shape = (pix.height, pix.width, pix.n)
-        tasks.append((i, (img_array.tobytes(), shape), text, dpi))
-
-    text_map = {}
-    images_map = {}
-    legends_map = {}
+    if render_in_worker:
+        doc.close()
+        tasks = [(path, i, dpi, spill_dir, profile) for i in pages]
+        worker = process_page_index
+    else:
+        tasks = []
+        for i in pages:
+            page = doc[i]
+            text = page.get_text().strip()
+            pix = page.get_pixmap(dpi=dpi)
+            img_array = np.frombuffer(pix.samples, dtype=np.uint8)
+            shape = (pix.height, pix.width, pix.n)
+            tasks.append((i, (img_array.tobytes(), shape), text, dpi, spill_dir, profile))
+        worker = process_page
+        metrics.record("prerender", t_start, time.time() - t_start, pages=total_pages)
+
+    page_stats = {}
 
     # 使用多进程池处理每一页
-    with multiprocessing.Pool(processes=min(8, multiprocessing.cpu_count())) as pool:
-        for j, (i, text, images,legends) in enumerate(pool.imap_unordered(process_page, tasks)):
-            text_map[i] = text
-            if images:
-                images_map[i] = images
-                legends_map[i] = legends
+    processes = min(8, multiprocessing.cpu_count())
+    submitted = time.time()
+    with multiprocessing.Pool(processes=processes, initializer=_init_worker,
+                              initargs=(path if render_in_worker else None, processes, ocr_backend)) as pool:
+        results = pool.imap_unordered(worker, tasks)
+        for j in range(total_pages):
+            # 等待结果时定期检查取消标志；退出 with 时 terminate 会结束所有工作进程
+            while True:
+                if cancel is not None and cancel.is_set():
+                    queue.put(("cancelled", j))
+                    return
+                try:
+                    i, text, images, legends, stats = results.next(timeout=0.2)
+                    break
+                except multiprocessing.TimeoutError:
+                    pass
+            collect_metrics(stats, submitted)
+            merge_page_stats(page_stats, stats)
+            queue.put(("page", (i, text, images, legends)))
             queue.put(("progress", int((j + 1) / total_pages * 100)))
 
-    return_dict["text"] = text_map
-    return_dict["images"] = images_map
-    return_dict["legends"] = legends_map
-    queue.put(("done", True))
+    if metrics.enabled():
+        metrics.record("extract_pdf", t_start, time.time() - t_start, pages=total_pages)
+        metrics.write(os.path.splitext(os.path.basename(path))[0], time.time() - submitted, processes)
+    queue.put(("done", {"stats": page_stats}))
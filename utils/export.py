@@ -0,0 +1,126 @@
+import os
+import json
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from PIL import Image
+from utils import metrics
+from utils.figures import FigureRef
+from utils.project_store import PNG_COMPRESS_LEVEL, decode_png
+
+# 导出图像格式：png 或 webp
+EXPORT_FORMAT = os.environ.get("PDF2MD_EXPORT_FORMAT", "png").lower()
+# PNG 压缩级别（0-9）；未设置时直接复用项目存储中已编码的 PNG（压缩级别为 PNG_COMPRESS_LEVEL=1，
+# 偏向写入速度，文件较大），尚未存入的图像按 PIL 默认级别编码。需要更小的文件时显式指定级别
+EXPORT_PNG_LEVEL = os.environ.get("PDF2MD_EXPORT_PNG_LEVEL")
+EXPORT_PNG_LEVEL = int(EXPORT_PNG_LEVEL) if EXPORT_PNG_LEVEL else None
+# WebP 质量（1-100），100 时使用无损模式
+EXPORT_WEBP_QUALITY = int(os.environ.get("PDF2MD_EXPORT_WEBP_QUALITY", "90"))
+# 图像编码线程数（PIL 编码时释放 GIL）
+EXPORT_WORKERS = min(8, multiprocessing.cpu_count())
+IMAGE_FORMATS = ("png", "webp")
+
+
+def export_markdown(export_folder, md_content, images_content, image_descriptions,
+                    image_format=EXPORT_FORMAT, png_level=EXPORT_PNG_LEVEL, webp_quality=EXPORT_WEBP_QUALITY,
+                    workers=EXPORT_WORKERS, on_progress=None, cancel=None):
+    """
+    写出导出目录：export.md + images/figNNN.png（或 .webp）+ image_descriptions.json。
+    返回 (md_path, 图像数量)。GUI 与命令行共用此函数，保证导出结构一致。
+    已存入项目存储的图像（FigureRef）在格式为 png 且 png_level 为 None 或与存储相同（1）时直接写出原 PNG 数据，不解码；
+    其余图像在线程池中编码。on_progress(done, total) 在调用线程中回调；
+    cancel（threading.Event）被设置后停止导出，返回 (None, 已写出的图像数)，不写 export.md。
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"不支持的图像格式: {image_format}")
+    with metrics.span("export", folder=os.path.basename(export_folder)):
+        return _export_markdown(export_folder, md_content, images_content, image_descriptions,
+                                image_format, png_level, webp_quality, workers, on_progress, cancel)
+
+
+def _write_figure(path, figure, png, image_format, png_level, webp_quality):
+    """png 为存储中已编码的数据（FigureRef）或 None（numpy 数组）"""
+    if png is not None and image_format == "png" and png_level in (None, PNG_COMPRESS_LEVEL):
+        with open(path, "wb") as f:
+            f.write(png)
+        return
+    img = Image.fromarray(decode_png(png) if png is not None else figure)
+    if image_format == "webp":
+        img.save(path, format="WEBP", quality=webp_quality, lossless=webp_quality >= 100)
+    elif png_level is None:
+        img.save(path, format="PNG")
+    else:
+        img.save(path, format="PNG", compress_level=png_level)
+
+
+def _ref_array(ref):
+    arr = ref.array()
+    if arr is None:
+        raise ValueError(f"图像 {ref.figure_id} 已不在项目存储中，请重新导出")
+    return arr
+
+
+def _export_markdown(export_folder, md_content, images_content, image_descriptions,
+                     image_format, png_level, webp_quality, workers, on_progress, cancel):
+    image_folder = os.path.join(export_folder, "images")
+    os.makedirs(image_folder, exist_ok=True)
+
+    description_map = {}
+    jobs = []
+    fig_count = 1
+    merged_md = ""
+    # 合并Markdown并插入图片引用
+    for page_idx, md in enumerate(md_content):
+        merged_md += md.strip() + "\n\n"
+        images = images_content.get(page_idx, [])
+        descriptions = image_descriptions.get(page_idx, [])
+        for i, figure in enumerate(images):
+            filename = f"fig{fig_count:03d}.{image_format}"
+            desc = descriptions[i] if i < len(descriptions) else f"图 {fig_count}"
+            jobs.append((os.path.join(image_folder, filename), figure))
+            description_map[filename] = desc
+            fig_count += 1
+
+    total = len(jobs)
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="export") as pool:
+        pending = set()
+        for path, figure in jobs:
+            if cancel is not None and cancel.is_set():
+                break
+            # 存储读取留在调用线程（每个线程一个数据库连接），线程池只做编码与写文件
+            png = None
+            if isinstance(figure, FigureRef):
+                png = figure.png()
+                if png is None:
+                    # 行在快照之后被后台写入替换或删除：退回解码缓存中的像素
+                    figure = _ref_array(figure)
+            pending.add(pool.submit(_write_figure, path, figure, png, image_format, png_level, webp_quality))
+            # 限制排队中的任务数，避免一次把所有图像数据读入内存
+            while len(pending) >= max(1, workers) * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                done += _collect(finished, on_progress, done, total)
+        finished, pending = wait(pending)
+        done += _collect(finished, on_progress, done, total)
+    if cancel is not None and cancel.is_set():
+        return None, done
+
+    # 写 Markdown 文件
+    md_path = os.path.join(export_folder, "export.md")
+    with open(md_path, "w", encoding="utf-8") as f:
+        f.write(merged_md.strip())
+
+    # 写 JSON 文件
+    json_path = os.path.join(export_folder, "image_descriptions.json")
+    with open(json_path, "w", encoding="utf-8") as jf:
+        json.dump(description_map, jf, ensure_ascii=False, indent=2)
+
+    return md_path, total
+
+
+def _collect(finished, on_progress, done, total):
+    for future in finished:
+        future.result()  # 编码或写文件出错时抛出
+        done += 1
+        if on_progress:
+            on_progress(done, total)
+    return len(finished)
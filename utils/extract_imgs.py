@@ -1,63 +1,349 @@
 import cv2
-import requests
-import base64
+import bisect
 import os
-from utils.extract_txt import get_access_token
+import fitz  # PyMuPDF
+import numpy as np
+from utils.ocr_backends import get_backend
+from utils.ocr_client import words_from_result
+from utils import metrics
 
-TOKEN = get_access_token()
+# 拼接图例时各块之间的白色间隔（像素），避免相邻图例的文字被识别到同一行
+LEGEND_GAP = 40
+# 合成图最长边的默认上限（后端有 max_side 时以后端为准）
+MAX_COMPOSITE_SIDE = 4096
+# 图形检测方式：multires 在缩小图上找候选区域，full 为原有的整页轮廓检测
+DETECT_MODE = os.environ.get("FIGURE_DETECT_MODE", "multires")
+# multires 模式下检测图的目标宽度（像素）
+DETECT_WIDTH = 800
+# 图形最小面积（像素，按任务 dpi 计算；以其他分辨率检测时按面积比例换算）
+MIN_AREA = 90000
+# 闭运算核边长、图例截取高度与最小高度（像素，均按任务 dpi 计算，以其他分辨率检测时按比例换算）
+CLOSE_KERNEL = 15
+LEGEND_HEIGHT = 200
+LEGEND_MIN_HEIGHT = 20
+# 单张嵌入图像覆盖页面面积超过该比例时视为扫描页，交给光栅检测
+SCAN_COVERAGE = 0.8
 
 def get_ocr_text(image_crop):
-    # 将图像编码为 base64
-    _, buffer = cv2.imencode('.jpg', image_crop)
-    img_base64 = base64.b64encode(buffer).decode()
+    return get_backend().text(image_crop)
 
-    url = f"https://aip.baidubce.com/rest/2.0/ocr/v1/general?access_token={TOKEN}" 
-    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    data = {"image": img_base64}
+def submit_ocr_text(image_crop):
+    """异步提交图例识别，返回 Future，结果为 OCR JSON"""
+    return get_backend().submit(image_crop)
 
-    response = requests.post(url, headers=headers, data=data)
-    result = response.json()
-    words = []
-    if "words_result" in result:
-        for w in result["words_result"]:
-            words.append(w["words"])
-    return "\n".join(words)
 
+def stitch_crops(crops, gap=LEGEND_GAP, max_side=MAX_COMPOSITE_SIDE):
+    """
+    将多个裁剪块纵向拼接成若干张合成图（白底，块间留 gap 像素）。
+    返回 [(合成图, [(块序号, 顶部y, 高度), ...]), ...]，超过 max_side 时另起一张。
+    """
+    groups = []
+    current, height, width = [], 0, 0
+    for idx, crop in enumerate(crops):
+        h, w = crop.shape[:2]
+        if w > max_side:
+            # 过宽的块等比缩小
+            scale = max_side / w
+            crop = cv2.resize(crop, (max_side, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+            h, w = crop.shape[:2]
+        h = min(h, max_side)
+        needed = h if not current else height + gap + h
+        if current and needed > max_side:
+            groups.append((current, height, width))
+            current, height, width = [], 0, 0
+            needed = h
+        top = needed - h
+        current.append((idx, top, crop[:h]))
+        height, width = needed, max(width, w)
+    if current:
+        groups.append((current, height, width))
 
-def extract_image(img, output_dir, index, min_area=90000):
-    os.makedirs(output_dir, exist_ok=True)
+    composites = []
+    for items, height, width in groups:
+        canvas = np.full((height, width, 3), 255, dtype=np.uint8)
+        offsets = []
+        for idx, top, crop in items:
+            h, w = crop.shape[:2]
+            canvas[top:top+h, :w] = crop
+            offsets.append((idx, top, h))
+        composites.append((canvas, offsets))
+    return composites
 
-    if img.shape[2] == 4:
-        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
 
+def _assign_words(result, offsets, texts):
+    """按文字框中心的纵坐标把识别结果分配回各裁剪块"""
+    tops = [top for _, top, _ in offsets]
+    words = {idx: [] for idx, _, _ in offsets}
+    for w in result.get("words_result", []):
+        loc = w.get("location")
+        if not loc:
+            continue
+        cy = loc["top"] + loc["height"] / 2
+        k = bisect.bisect_right(tops, cy) - 1
+        if k < 0:
+            continue
+        idx, top, h = offsets[k]
+        if cy < top + h:
+            words[idx].append(w["words"])
+    for idx, lines in words.items():
+        texts[idx] = "\n".join(lines)
+
+
+def ocr_legend_crops(crops):
+    """
+    批量识别图例：把所有裁剪块（可来自同一页或多页）拼成少量合成图，每张只发一次请求，
+    再根据返回的 location 把文字映射回各块。返回与 crops 等长的文字列表。
+    """
+    texts = [""] * len(crops)
+    if not crops:
+        return texts
+    backend = get_backend()
+    with metrics.span("legend_ocr", crops=len(crops)):
+        composites = stitch_crops(crops, max_side=backend.max_side or MAX_COMPOSITE_SIDE)
+        futures = [(backend.submit(canvas), offsets) for canvas, offsets in composites]
+        for future, offsets in futures:
+            _assign_words(future.result(), offsets, texts)
+    return texts
+
+
+def _kernel_size(scale, f=1):
+    # 闭运算核按检测分辨率换算，低分辨率检测时不会把相邻文字段落连成一块
+    return max(3, int(round(CLOSE_KERNEL * scale / f)) | 1)
+
+
+def _detect_full(img, min_area, scale=1.0):
+    """原有方式：整页二值化 + 15×15（按 scale 换算）闭运算 + 外轮廓，逐个轮廓筛选"""
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     _, binary = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY_INV)
 
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (15, 15))
+    k = _kernel_size(scale)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (k, k))
     morph = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
 
     contours, _ = cv2.findContours(morph, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    extracted_figures = []
-    legends = []
-
+    boxes = []
     for cnt in contours:
         x, y, w, h = cv2.boundingRect(cnt)
         area = w * h
         aspect_ratio = w / h
 
         if area > min_area and 0.5 < aspect_ratio < 2.0:
-            figure = img[y:y+h, x:x+w]
-            extracted_figures.append(figure)
-
-            # 尝试提取图形下方的图例（向下偏移一定高度）
-            legend_height = min(200, img.shape[0] - (y+h))  # 避免越界
-            if legend_height > 20:
-                legend_crop = img[y+h:y+h+legend_height, x:x+w]
-                legend_text = get_ocr_text(legend_crop)
-                legends.append(legend_text)
-            else:
-                legends.append("")
+            boxes.append((x, y, w, h))
+    return boxes
+
+
+def _detect_multires(img, min_area, scale=1.0, detect_width=DETECT_WIDTH):
+    """
+    在缩小图上检测候选区域：全分辨率只做灰度化与 f×f 最小值池化，二值化、闭运算与连通域统计
+    都在缩小图上完成，面积/长宽比筛选全部向量化，最后仅在候选框内用全分辨率像素收紧边界。
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    H, W = gray.shape
+    f = max(1, int(round(W / detect_width)))
+    if f > 1 and H >= f:
+        # 腐蚀即最小值滤波，再按整数步长最近邻取样 = 最小池化，细线在缩小后不会丢失
+        pooled = cv2.erode(gray, np.ones((f, f), np.uint8))[:H // f * f, :W // f * f]
+        small = cv2.resize(pooled, (W // f, H // f), interpolation=cv2.INTER_NEAREST)
+    else:
+        small, f = gray, 1
+    _, binary = cv2.threshold(small, 240, 255, cv2.THRESH_BINARY_INV)
 
+    k = _kernel_size(scale, f)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (k, k))
+    morph = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+
+    n, _, stats, _ = cv2.connectedComponentsWithStats(morph, connectivity=8)
+    if n <= 1:
+        return []
+    st = stats[1:, :4].astype(np.int64)
+    # 缩小图中的像素 x 对应全分辨率 [x*f - f//2, x*f - f//2 + f)，贴边的框延伸到图像边界
+    half = f // 2
+    x0 = np.maximum(st[:, 0] * f - half, 0)
+    y0 = np.maximum(st[:, 1] * f - half, 0)
+    x1 = np.where(st[:, 0] + st[:, 2] >= small.shape[1], W, np.minimum((st[:, 0] + st[:, 2]) * f - half, W))
+    y1 = np.where(st[:, 1] + st[:, 3] >= small.shape[0], H, np.minimum((st[:, 1] + st[:, 3]) * f - half, H))
+    w, h = x1 - x0, y1 - y0
+    aspect = w / np.maximum(h, 1)
+    keep = (w * h > min_area) & (aspect > 0.5) & (aspect < 2.0)
+    if not keep.any():
+        return []
+    cand = np.stack([x0[keep], y0[keep], x1[keep], y1[keep]], axis=1)
+
+    # 去掉完全落在其他候选框内的候选（外轮廓检测不会返回这类内部区域）
+    inside = ((cand[:, None, 0] >= cand[None, :, 0]) & (cand[:, None, 1] >= cand[None, :, 1]) &
+              (cand[:, None, 2] <= cand[None, :, 2]) & (cand[:, None, 3] <= cand[None, :, 3]))
+    np.fill_diagonal(inside, False)
+    cand = cand[~inside.any(axis=1)]
+
+    # 最小池化保证粗框包含全部墨迹，只需在粗框内用全分辨率像素收紧边界
+    boxes = []
+    for bx0, by0, bx1, by1 in cand[np.argsort(cand[:, 1], kind="stable")]:
+        _, roi = cv2.threshold(gray[by0:by1, bx0:bx1], 240, 255, cv2.THRESH_BINARY_INV)
+        x, y, w, h = cv2.boundingRect(roi)
+        if w == 0 or h == 0:
+            continue
+        x, y = int(x + bx0), int(y + by0)
+        if w * h > min_area and 0.5 < w / h < 2.0:
+            boxes.append((x, y, w, h))
+    return boxes
+
+
+def detect_figures(img, min_area=None, mode=None, scale=1.0):
+    """
+    检测页面中的图形区域，返回全分辨率下的 [(x, y, w, h), ...]。
+    scale 为检测分辨率与任务 dpi 之比，闭运算核与默认最小面积（MIN_AREA × scale²）随之换算。
+    """
+    if img.shape[2] == 4:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    if min_area is None:
+        min_area = MIN_AREA * scale ** 2
+    mode = mode or DETECT_MODE
+    with metrics.span("detect", mode=mode):
+        if mode == "full":
+            return _detect_full(img, min_area, scale)
+        return _detect_multires(img, min_area, scale)
+
+
+def extract_image(img, output_dir, index, min_area=None, batch_legends=True, detect_mode=None, scale=1.0):
+    """
+    batch_legends=True 时本页所有图例拼接成一次 OCR 请求，否则每个图例单独并发请求；
+    detect_mode 为 multires / full，默认取 FIGURE_DETECT_MODE 环境变量。
+    scale 为 img 的分辨率与任务 dpi 之比（见 detect_figures），图例截取高度随之换算。
+    """
+    with metrics.span("extract_image", page=index):
+        extracted_figures, legends = _extract_image(img, output_dir, min_area, batch_legends, detect_mode, scale)
     print(f"✅ 第 {index+1} 页提取 {len(extracted_figures)} 个图形及图例")
     return extracted_figures, legends
+
+
+def _extract_image(img, output_dir, min_area, batch_legends, detect_mode, scale):
+    os.makedirs(output_dir, exist_ok=True)
+
+    if img.shape[2] == 4:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+
+    extracted_figures = []
+    legend_crops = []
+
+    for x, y, w, h in detect_figures(img, min_area, detect_mode, scale):
+        figure = img[y:y+h, x:x+w]
+        extracted_figures.append(figure)
+
+        # 尝试提取图形下方的图例（向下偏移一定高度）
+        legend_height = min(int(round(LEGEND_HEIGHT * scale)), img.shape[0] - (y+h))  # 避免越界
+        if legend_height > LEGEND_MIN_HEIGHT * scale:
+            legend_crops.append(img[y+h:y+h+legend_height, x:x+w])
+        else:
+            legend_crops.append(None)
+
+    valid = [k for k, crop in enumerate(legend_crops) if crop is not None]
+    legends = [""] * len(legend_crops)
+    if batch_legends:
+        for k, text in zip(valid, ocr_legend_crops([legend_crops[k] for k in valid])):
+            legends[k] = text
+    else:
+        # 各图例并发识别，按原顺序收集结果
+        futures = [(k, submit_ocr_text(legend_crops[k])) for k in valid]
+        for k, future in futures:
+            legends[k] = words_from_result(future.result())
+    return extracted_figures, legends
+
+
+def _is_figure_rect(rect, scale, min_area):
+    """按光栅检测相同的面积/长宽比规则判断 PDF 坐标下的矩形（scale = dpi/72）"""
+    w, h = rect.width * scale, rect.height * scale
+    return h > 0 and w * h > min_area and 0.5 < w / h < 2.0
+
+
+def _pixmap_to_array(pix):
+    """统一转换为 RGB 三通道数组（CMYK/灰度转 RGB，带 alpha 的合成到白底）"""
+    if pix.n - pix.alpha != 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    if pix.alpha:
+        # MuPDF 的 alpha 像素是预乘的：白底合成即 rgb + (255 - alpha)
+        return (arr[:, :, :3] + (255 - arr[:, :, 3:])).astype(np.uint8)
+    return arr.copy()
+
+
+def _is_upright(transform):
+    """图像放置矩阵只有正向缩放与平移（无旋转、镜像）时，原始像素与页面显示一致"""
+    a, b, c, d = transform[:4]
+    return abs(b) < 1e-6 and abs(c) < 1e-6 and a > 0 and d > 0
+
+
+def _embedded_pixmap(doc, xref):
+    """
+    按原始分辨率取出嵌入图像，附带软蒙版（/SMask）；
+    带 /Mask（模板或色键蒙版）时返回 None，由调用方改为渲染所在区域。
+    """
+    if doc.xref_get_key(xref, "Mask")[0] != "null":
+        return None
+    pix = fitz.Pixmap(doc, xref)
+    kind, value = doc.xref_get_key(xref, "SMask")
+    if kind == "xref":
+        pix = fitz.Pixmap(pix, fitz.Pixmap(doc, int(value.split()[0])))
+    return pix
+
+
+def legend_from_text_layer(page, rect, dpi=300):
+    """图例：图形下方 LEGEND_HEIGHT 像素（按 dpi 换算）范围内的文字层"""
+    scale = dpi / 72
+    legend_rect = fitz.Rect(rect.x0, rect.y1, rect.x1, min(page.rect.y1, rect.y1 + LEGEND_HEIGHT / scale))
+    if legend_rect.height * scale > LEGEND_MIN_HEIGHT:
+        return page.get_text("text", clip=legend_rect).strip()
+    return ""
+
+
+def extract_embedded_images(page, index, dpi=300, min_area=MIN_AREA):
+    """
+    文字层页面的快速路径：直接取出 PDF 中嵌入的图像（原始分辨率），图例取图像下方的文字层，
+    不渲染整页、不调用 OCR。页面含有可能构成图形的矢量绘图、或是整页扫描图时返回 None，
+    由调用方回退到整页光栅检测。
+    """
+    with metrics.span("embedded_images", page=index):
+        result = _extract_embedded_images(page, dpi, min_area)
+    if result is not None:
+        print(f"✅ 第 {index+1} 页提取 {len(result[0])} 个嵌入图像及图例")
+    return result
+
+
+def _extract_embedded_images(page, dpi, min_area):
+    scale = dpi / 72
+    page_area = page.rect.width * page.rect.height
+
+    # 矢量图（图表、流程图等）只能靠光栅检测
+    if hasattr(page, "cluster_drawings"):
+        drawing_rects = page.cluster_drawings()
+    else:
+        drawing_rects = [d["rect"] for d in page.get_drawings()]
+    if any(_is_figure_rect(r, scale, min_area) for r in drawing_rects):
+        return None
+
+    infos = page.get_image_info(xrefs=True)
+    for info in infos:
+        r = fitz.Rect(info["bbox"]) & page.rect
+        if page_area and r.width * r.height / page_area > SCAN_COVERAGE:
+            return None
+
+    doc = page.parent
+    extracted_figures = []
+    legends = []
+    for info in infos:
+        rect = fitz.Rect(info["bbox"]) & page.rect
+        if rect.is_empty or not _is_figure_rect(rect, scale, min_area):
+            continue
+        xref = info.get("xref", 0)
+        try:
+            # 旋转 / 镜像放置或带模板蒙版的图像取原始像素与页面显示不一致
+            pix = _embedded_pixmap(doc, xref) if xref and _is_upright(info["transform"]) else None
+            if pix is None:
+                # 内联图像（没有 xref）与上述图像只渲染其所在区域
+                pix = page.get_pixmap(dpi=dpi, clip=rect)
+            figure = _pixmap_to_array(pix)
+        except Exception:
+            return None
+        extracted_figures.append(figure)
+        legends.append(legend_from_text_layer(page, rect, dpi))
+    return extracted_figures, legends
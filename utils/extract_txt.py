@@ -1,38 +1,106 @@
-import base64
+import os
+import json
+import time
+import hashlib
+import threading
 import requests
-import io
-from PIL import Image
+from utils.ocr_client import OCRClient, BASE_URL
+from utils.ocr_cache import get_cache, CACHE_DIR
 
 # 百度 API 密钥
 API_KEY = ""
 SECRET_KEY = ""
 
+# access_token 磁盘缓存，供 GUI、工作进程和命令行共享
+TOKEN_CACHE_PATH = os.path.join(CACHE_DIR, "baidu_token.json")
+# 距过期不足该秒数时提前刷新
+TOKEN_REFRESH_MARGIN = 24 * 3600
+
+_token = {"access_token": "", "expires_at": 0.0}
+_token_lock = threading.Lock()
+
+
+class TokenError(RuntimeError):
+    """获取 access_token 失败（网络错误、超时、非 JSON 响应或密钥无效）"""
+
+
+def _key_id():
+    # 区分不同的 API_KEY，换密钥后旧 token 自动失效（不在磁盘上保存密钥本身）
+    return hashlib.sha256(f"{BASE_URL}|{API_KEY}".encode("utf-8")).hexdigest()[:16]
+
+
+def _load_token_file():
+    try:
+        with open(TOKEN_CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("key_id") != _key_id():
+        return None
+    return data
+
+
+def _save_token_file(token, expires_at):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{TOKEN_CACHE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"key_id": _key_id(), "access_token": token, "expires_at": expires_at}, f)
+    os.replace(tmp_path, TOKEN_CACHE_PATH)
+
+
 # 获取 access_token
-def get_access_token():
-    url = f"https://aip.baidubce.com/oauth/2.0/token"
-    params = {
-        "grant_type": "client_credentials",
-        "client_id": API_KEY,
-        "client_secret": SECRET_KEY
-    }
-    response = requests.post(url, data=params)
-    return response.json().get("access_token", "")
-
-access_token = get_access_token()
+def get_access_token(refresh=False):
+    """
+    首次使用时才请求 access_token，并按有效期缓存在内存与磁盘；
+    refresh=True 时忽略缓存重新获取（token 失效时由 OCR 客户端调用）。
+    请求带 OCR 客户端的超时，失败时抛出 TokenError，不会让等待该锁的其他线程无限阻塞。
+    """
+    with _token_lock:
+        now = time.time()
+        if not refresh:
+            if _token["access_token"] and _token["expires_at"] - TOKEN_REFRESH_MARGIN > now:
+                return _token["access_token"]
+            data = _load_token_file()
+            if data and data["access_token"] and data["expires_at"] - TOKEN_REFRESH_MARGIN > now:
+                _token.update(access_token=data["access_token"], expires_at=data["expires_at"])
+                return _token["access_token"]
+
+        url = f"{BASE_URL}/oauth/2.0/token"
+        params = {
+            "grant_type": "client_credentials",
+            "client_id": API_KEY,
+            "client_secret": SECRET_KEY
+        }
+        client = get_client()
+        try:
+            response = client.session.post(url, data=params, timeout=client.timeout)
+            result = response.json()
+        except ValueError as e:  # 先于 RequestException：新版 requests 的 JSONDecodeError 同时继承两者
+            raise TokenError(f"获取 access_token 失败: HTTP {response.status_code} 响应不是 JSON") from e
+        except requests.RequestException as e:
+            raise TokenError(f"获取 access_token 失败: {e}") from e
+        token = result.get("access_token", "") if isinstance(result, dict) else ""
+        if not token:
+            detail = result.get("error_description") or result.get("error") if isinstance(result, dict) else None
+            raise TokenError(f"获取 access_token 失败: {detail or response.status_code}")
+        expires_at = now + float(result.get("expires_in", 0))
+        _token.update(access_token=token, expires_at=expires_at)
+        try:
+            _save_token_file(token, expires_at)
+        except OSError:
+            pass
+        return token
+
+_client = None
+
+def get_client():
+    """进程内共享的 OCR 客户端（长连接 + 限速 + 重试）"""
+    global _client
+    if _client is None:
+        _client = OCRClient(get_access_token, cache=get_cache())
+    return _client
 
 def baidu_ocr_image(image):
-    """对PIL图像进行百度OCR识别"""
-    if image.shape[2] == 4:  # RGBA
-        img_pil = Image.fromarray(image, mode="RGBA")
-    else:  # RGB
-        img_pil = Image.fromarray(image, mode="RGB")
-    buffered = io.BytesIO()
-    img_pil.save(buffered, format="PNG")
-    img_base64 = base64.b64encode(buffered.getvalue()).decode()
-
-    url = f"https://aip.baidubce.com/rest/2.0/ocr/v1/general?access_token={access_token}"
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    data = {"image": img_base64}
-    resp = requests.post(url, headers=headers, data=data)
-    words = [item["words"] for item in resp.json().get("words_result", [])]
-    return "\n".join(words)
\ No newline at end of file
+    """对整页图像进行OCR识别（使用当前选择的 OCR 后端，默认百度）"""
+    from utils.ocr_backends import get_backend
+    return get_backend().text(image, lossless=True)
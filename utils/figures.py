@@ -0,0 +1,155 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+# 已解码图像的内存上限（MB），超出后按最近使用淘汰
+FIGURE_CACHE_MB = float(os.environ.get("PDF2MD_FIGURE_CACHE_MB", "256"))
+# 图像面板缩略图的尺寸与内存上限（MB）
+THUMB_SIZE = (200, 200)
+THUMB_CACHE_MB = float(os.environ.get("PDF2MD_THUMB_CACHE_MB", "32"))
+
+
+def _nbytes(value):
+    return value.nbytes
+
+
+def image_bytes(img):
+    """PIL 图像的像素字节数"""
+    return img.width * img.height * len(img.getbands())
+
+
+class ByteLRUCache:
+    """按字节数限制容量的 LRU 缓存；sizeof 估算每项的字节数，默认取 numpy 数组的 nbytes。图像解码缓存、缩略图缓存与页面位图缓存共用"""
+
+    def __init__(self, max_bytes, sizeof=_nbytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            arr = self._items.get(key)
+            if arr is not None:
+                self._items.move_to_end(key)
+            return arr
+
+    def put(self, key, arr):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= self.sizeof(old)
+            size = self.sizeof(arr)
+            if size > self.max_bytes:
+                return
+            self._items[key] = arr
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.bytes -= self.sizeof(evicted)
+
+    def discard(self, key):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= self.sizeof(old)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+
+_cache = ByteLRUCache(int(FIGURE_CACHE_MB * 1024 * 1024))
+_thumb_cache = ByteLRUCache(int(THUMB_CACHE_MB * 1024 * 1024), sizeof=image_bytes)
+
+
+def get_figure_cache():
+    return _cache
+
+
+def get_thumb_cache():
+    return _thumb_cache
+
+
+def make_thumbnail(img_array):
+    """numpy 数组 -> 图像面板使用的缩略图（PIL 图像）"""
+    return Image.fromarray(img_array).resize(THUMB_SIZE, resample=Image.Resampling.LANCZOS)
+
+
+def encode_thumbnail(img_array):
+    buffered = io.BytesIO()
+    make_thumbnail(img_array).save(buffered, format="PNG", compress_level=1)
+    return buffered.getvalue()
+
+
+def decode_thumbnail(data):
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img
+
+
+class FigureRef:
+    """
+    项目存储中一张图像的引用：恢复项目时只读取 id 与尺寸，
+    显示或导出需要像素时才从存储解码，解码结果放入共享的 LRU 缓存。
+    """
+
+    __slots__ = ("store", "figure_id", "width", "height")
+
+    def __init__(self, store, figure_id, width=None, height=None):
+        self.store = store
+        self.figure_id = figure_id
+        self.width = width
+        self.height = height
+
+    def _key(self):
+        return (self.store.path, self.figure_id)
+
+    def array(self):
+        arr = _cache.get(self._key())
+        if arr is None:
+            arr = self.store.figure_array(self.figure_id)
+            if arr is not None:  # 行已被删除
+                _cache.put(self._key(), arr)
+        return arr
+
+    def thumbnail(self):
+        """
+        缩略图：先查内存缓存，再读存储中保存的缩略图；旧项目中没有缩略图的图像
+        首次显示时由原图生成并写回存储，之后不再需要解码原图。
+        """
+        key = self._key()
+        img = _thumb_cache.get(key)
+        if img is None:
+            data = self.store.figure_thumb(self.figure_id)
+            if data is None:
+                data = encode_thumbnail(self.array())
+                self.store.set_figure_thumb(self.figure_id, data)
+            img = decode_thumbnail(data)
+            _thumb_cache.put(key, img)
+        return img
+
+    def png(self):
+        """已编码的 PNG 数据（不解码）"""
+        return self.store.figure_png(self.figure_id)
+
+    def __repr__(self):
+        return f"FigureRef({self.figure_id}, {self.width}x{self.height})"
+
+
+def as_array(figure):
+    """FigureRef 或 numpy 数组 -> numpy 数组"""
+    return figure.array() if isinstance(figure, FigureRef) else figure
+
+
+def thumbnail(figure):
+    """FigureRef 或 numpy 数组 -> 缩略图（未保存的数组每次现算）"""
+    return figure.thumbnail() if isinstance(figure, FigureRef) else make_thumbnail(figure)
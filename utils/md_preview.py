@@ -0,0 +1,110 @@
+import re
+import threading
+from collections import OrderedDict
+
+# 编辑停止多久后刷新预览（毫秒）
+PREVIEW_DELAY_MS = 300
+# 块级 HTML 缓存的条目数上限
+BLOCK_CACHE_SIZE = 4096
+
+_FENCE = re.compile(r"^(```|~~~)")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s")
+_QUOTE = re.compile(r"^ {0,3}>")
+# 引用式链接的定义行：定义与引用可能在不同块中，出现时整篇一起转换
+_REFERENCE = re.compile(r"^ {0,3}\[[^\]]+\]:", re.M)
+
+
+def split_blocks(text):
+    """
+    按空行把 Markdown 切成可独立转换的块。以下空行不切分：围栏代码块内、
+    其后为缩进行（列表项的续行或缩进代码块）、列表中两项之间（松散列表）、引用块中两段之间。
+    含引用式链接定义时不切分，整篇作为一块。其他跨块语法（如 HTML 块内的空行）逐块转换的结果可能与整体转换不同。
+    """
+    if _REFERENCE.search(text):
+        return [text]
+    blocks, current, fence = [], [], None
+    blank, in_list, in_quote = 0, False, False
+    for line in text.split("\n"):
+        if fence is not None:
+            current.append(line)
+            if line.lstrip().startswith(fence):
+                fence = None
+            continue
+        if not line.strip():
+            blank += 1
+            continue
+        if blank and current:
+            if line[0] in " \t" or (in_list and _LIST_ITEM.match(line)) or (in_quote and _QUOTE.match(line)):
+                current += [""] * blank
+            else:
+                blocks.append("\n".join(current))
+                current, in_list, in_quote = [], False, False
+        blank = 0
+        match = _FENCE.match(line.lstrip())
+        if match:
+            fence = match.group(1)
+        in_list = in_list or bool(_LIST_ITEM.match(line))
+        in_quote = in_quote or bool(_QUOTE.match(line))
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+class MarkdownPreviewRenderer:
+    """
+    后台预览渲染线程：submit 只保留最新一次的文本，旧的渲染在块之间检查到过期即放弃。
+    块级结果按文本缓存，编辑一处时只有改动的块重新转换。
+    on_done(generation, html, error) 在渲染线程中回调，调用方自行转交界面线程。
+    """
+
+    def __init__(self, on_done):
+        self.on_done = on_done
+        self.generation = 0
+        self._text = None
+        self._cache = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="md-preview", daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        with self._cond:
+            self.generation += 1
+            self._text = text
+            self._cond.notify_all()
+            return self.generation
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def _convert(self, md, block):
+        html = self._cache.get(block)
+        if html is None:
+            md.reset()
+            html = md.convert(block)
+            self._cache[block] = html
+            if len(self._cache) > BLOCK_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(block)
+        return html
+
+    def _run(self):
+        import markdown
+        md = markdown.Markdown()
+        while True:
+            with self._cond:
+                while self._text is None:
+                    self._cond.wait()
+                text, generation = self._text, self.generation
+                self._text = None
+            parts = []
+            try:
+                for block in split_blocks(text):
+                    if not self.is_current(generation):
+                        break
+                    parts.append(self._convert(md, block))
+                else:
+                    self.on_done(generation, "\n".join(parts), None)
+            except Exception as e:
+                self.on_done(generation, None, e)
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import threading
+from contextlib import nullcontext
+
+# 开启方式：环境变量 PDF2MD_TRACE=<输出目录>，或命令行 --trace <输出目录>。
+# 关闭时 span() 返回共享的空上下文、count() 直接返回，几乎没有开销。
+TRACE_DIR = os.environ.get("PDF2MD_TRACE", "")
+
+_enabled = bool(TRACE_DIR)
+_lock = threading.Lock()
+# 本进程记录的 Chrome trace 事件（"X" 完整事件），工作进程随每页结果取出送回父进程
+_events = []
+_counters = {}
+# 只汇总不画入 trace 的观测值（如排队等待时间）：name -> [次数, 总秒数, 最大秒数]
+_observations = {}
+_NULL = nullcontext()
+
+
+def enable(trace_dir):
+    """开启记录；写入环境变量，使之后启动的（spawn）工作进程同样开启"""
+    global _enabled, TRACE_DIR
+    TRACE_DIR = trace_dir
+    _enabled = True
+    os.environ["PDF2MD_TRACE"] = trace_dir
+
+
+def enabled():
+    return _enabled
+
+
+class _Span:
+    __slots__ = ("name", "args", "ts", "t0")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.ts = time.time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.ts, time.perf_counter() - self.t0, **self.args)
+        return False
+
+
+def span(name, **args):
+    """计时上下文：with metrics.span("render", page=i): ..."""
+    if not _enabled:
+        return _NULL
+    return _Span(name, args)
+
+
+def record(name, start, seconds, **args):
+    """记录一个已完成的区间（start 为 time.time() 时间戳），用于回调中结束的异步调用"""
+    if not _enabled:
+        return
+    event = {"name": name, "ph": "X", "ts": start * 1e6, "dur": seconds * 1e6,
+             "pid": os.getpid(), "tid": threading.get_ident()}
+    if args:
+        event["args"] = args
+    with _lock:
+        _events.append(event)
+
+
+def count(name, value=1):
+    """累加计数器，如 OCR 上传字节数、渲染像素数"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, seconds):
+    if not _enabled:
+        return
+    with _lock:
+        o = _observations.setdefault(name, [0, 0.0, 0.0])
+        o[0] += 1
+        o[1] += seconds
+        o[2] = max(o[2], seconds)
+
+
+def pop():
+    """取出并清空本进程的记录，供工作进程随结果送回；未开启时返回 None"""
+    global _events, _counters, _observations
+    if not _enabled:
+        return None
+    with _lock:
+        payload = {"events": _events, "counters": _counters, "observations": _observations}
+        _events, _counters, _observations = [], {}, {}
+    return payload
+
+
+def merge(payload, submitted=None):
+    """
+    在父进程合并工作进程送回的记录。
+    submitted 为任务提交时刻（time.time()），据此把每页开始处理前的等待计入 queue_wait。
+    """
+    if not payload:
+        return
+    with _lock:
+        _events.extend(payload["events"])
+        for k, v in payload["counters"].items():
+            _counters[k] = _counters.get(k, 0) + v
+        for k, (n, total, peak) in payload["observations"].items():
+            o = _observations.setdefault(k, [0, 0.0, 0.0])
+            o[0] += n
+            o[1] += total
+            o[2] = max(o[2], peak)
+    if submitted is not None:
+        for event in payload["events"]:
+            if event["name"] == "page":
+                observe("queue_wait", max(0.0, event["ts"] / 1e6 - submitted))
+
+
+def _aggregate(n, total, peak):
+    return {"count": n, "total_s": round(total, 6), "mean_ms": round(total / max(n, 1) * 1000, 3),
+            "max_ms": round(peak * 1000, 3)}
+
+
+def summary(wall=None, workers=None):
+    """
+    JSON 摘要：各阶段次数/总耗时/平均/最大、计数器、排队等待，
+    以及按进程统计的页面处理忙碌时间与工作进程利用率（忙碌时间 / (墙钟时间 × 进程数)）。
+    """
+    with _lock:
+        events = list(_events)
+        counters = dict(_counters)
+        observations = {k: list(v) for k, v in _observations.items()}
+    spans = {}
+    busy = {}
+    for e in events:
+        s = spans.setdefault(e["name"], [0, 0.0, 0.0])
+        seconds = e["dur"] / 1e6
+        s[0] += 1
+        s[1] += seconds
+        s[2] = max(s[2], seconds)
+        if e["name"] == "page":
+            b = busy.setdefault(e["pid"], {"pages": 0, "busy_s": 0.0})
+            b["pages"] += 1
+            b["busy_s"] += seconds
+    result = {
+        "spans": {k: _aggregate(*v) for k, v in sorted(spans.items())},
+        "counters": counters,
+        "observations": {k: _aggregate(*v) for k, v in sorted(observations.items())},
+        "workers": {str(pid): {"pages": b["pages"], "busy_s": round(b["busy_s"], 6)}
+                    for pid, b in sorted(busy.items())},
+    }
+    if wall:
+        result["wall_s"] = round(wall, 6)
+        if workers:
+            total_busy = sum(b["busy_s"] for b in busy.values())
+            result["utilization"] = round(total_busy / (wall * workers), 4)
+    return result
+
+
+def write(name, wall=None, workers=None):
+    """写出 <TRACE_DIR>/<name>.metrics.json 与 <name>.trace.json（可在 chrome://tracing / Perfetto 打开）"""
+    if not _enabled:
+        return None
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    summary_path = os.path.join(TRACE_DIR, f"{name}.metrics.json")
+    trace_path = os.path.join(TRACE_DIR, f"{name}.trace.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary(wall, workers), f, ensure_ascii=False, indent=2)
+    with _lock:
+        events = list(_events)
+    main_pid = os.getpid()
+    meta = [{"name": "process_name", "ph": "M", "pid": pid,
+             "args": {"name": "main" if pid == main_pid else f"worker {pid}"}}
+            for pid in sorted({e["pid"] for e in events} | {main_pid})]
+    with open(trace_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+    return summary_path, trace_path
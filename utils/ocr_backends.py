@@ -0,0 +1,238 @@
+import io
+import os
+import time
+import base64
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+import cv2
+from PIL import Image
+from utils.ocr_client import words_from_result
+from utils import metrics
+
+# 默认 OCR 后端，可用环境变量 OCR_BACKEND 或命令行 --ocr-backend 覆盖
+DEFAULT_BACKEND = os.environ.get("OCR_BACKEND", "baidu")
+
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class OCRBackend(ABC):
+    """
+    OCR 后端接口，子类实现 _recognize。recognize 返回与百度通用文字识别相同结构的 dict：
+    {"words_result": [{"words": str, "location": {"left", "top", "width", "height"}}, ...]}，
+    因此 words_from_result、图例拼接映射等逻辑与具体后端无关。
+    """
+
+    name = "base"
+    # 单张图像最长边上限（像素），None 表示不限
+    max_side = None
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.pixels = 0
+
+    def _record(self, image, seconds):
+        metrics.count("ocr_pixels", image.shape[0] * image.shape[1])
+        with self._stats_lock:
+            self.calls += 1
+            self.seconds += seconds
+            self.pixels += image.shape[0] * image.shape[1]
+
+    @abstractmethod
+    def _recognize(self, image, lossless=False):
+        """识别一张 numpy 图像，返回上述结构的 dict"""
+
+    def recognize(self, image, lossless=False):
+        """同步识别 numpy 图像；lossless=True 表示整页识别，尽量无损编码"""
+        t0 = time.perf_counter()
+        try:
+            with metrics.span("ocr", backend=self.name, pixels=image.shape[0] * image.shape[1]):
+                return self._recognize(image, lossless)
+        finally:
+            self._record(image, time.perf_counter() - t0)
+
+    def submit(self, image, lossless=False):
+        """异步识别，返回 Future；默认实现在当前线程同步完成"""
+        return _completed(self.recognize(image, lossless))
+
+    def text(self, image, lossless=False):
+        return words_from_result(self.recognize(image, lossless))
+
+    def pop_stats(self):
+        """取出并清零本进程的统计：{后端名: {calls, seconds, pixels}}"""
+        with self._stats_lock:
+            stats = {self.name: {"calls": self.calls, "seconds": self.seconds, "pixels": self.pixels}}
+            self._reset_stats()
+        return stats if stats[self.name]["calls"] else {}
+
+
+class BaiduOCRBackend(OCRBackend):
+    """百度通用文字识别（经共享 OCRClient：长连接、限速、重试、结果缓存）"""
+
+    name = "baidu"
+    max_side = 4096
+
+    def __init__(self, endpoint="general"):
+        super().__init__()
+        from utils.extract_txt import get_client  # 避免循环导入
+        self.client = get_client()
+        self.endpoint = endpoint
+
+    @staticmethod
+    def encode(image, lossless=False):
+        if lossless:
+            mode = "RGBA" if image.shape[2] == 4 else "RGB"
+            buffered = io.BytesIO()
+            Image.fromarray(image, mode=mode).save(buffered, format="PNG")
+            encoded = base64.b64encode(buffered.getvalue()).decode()
+        else:
+            _, buffer = cv2.imencode('.jpg', image)
+            encoded = base64.b64encode(buffer).decode()
+        # 实际上传的字节数（base64 编码后）
+        metrics.count("ocr_bytes", len(encoded))
+        return encoded
+
+    def _recognize(self, image, lossless=False):
+        return self.client.request(self.endpoint, self.encode(image, lossless))
+
+    def submit(self, image, lossless=False):
+        ts, t0 = time.time(), time.perf_counter()
+        inner = self.client.submit(self.endpoint, self.encode(image, lossless))
+        # 返回的 Future 在统计记录之后才完成，调用方 result() 返回后 pop_stats 一定能取到本次调用
+        future = Future()
+
+        def done(f):
+            seconds = time.perf_counter() - t0
+            self._record(image, seconds)
+            metrics.record("ocr", ts, seconds, backend=self.name, pixels=image.shape[0] * image.shape[1])
+            if f.exception() is not None:
+                future.set_exception(f.exception())
+            else:
+                future.set_result(f.result())
+
+        inner.add_done_callback(done)
+        return future
+
+
+class TesseractOCRBackend(OCRBackend):
+    """本地 Tesseract（pytesseract），离线可用，直接在工作进程内占用 CPU 识别"""
+
+    name = "tesseract"
+
+    def __init__(self, lang=None):
+        super().__init__()
+        try:
+            import pytesseract
+        except ImportError as e:
+            raise RuntimeError("使用 tesseract 后端需要安装 pytesseract 与 Tesseract 引擎") from e
+        self.pytesseract = pytesseract
+        self.lang = lang or os.environ.get("TESSERACT_LANG", "chi_sim+eng")
+
+    def _recognize(self, image, lossless=False):
+        data = self.pytesseract.image_to_data(
+            Image.fromarray(image[:, :, :3]), lang=self.lang, output_type=self.pytesseract.Output.DICT
+        )
+        # 按 (block, par, line) 合并为行，与百度结果一样一行一条
+        lines = {}
+        for k, word in enumerate(data["text"]):
+            if not word.strip():
+                continue
+            key = (data["block_num"][k], data["par_num"][k], data["line_num"][k])
+            left, top = data["left"][k], data["top"][k]
+            right, bottom = left + data["width"][k], top + data["height"][k]
+            if key in lines:
+                line = lines[key]
+                line["words"].append(word)
+                line["box"] = [min(line["box"][0], left), min(line["box"][1], top),
+                               max(line["box"][2], right), max(line["box"][3], bottom)]
+            else:
+                lines[key] = {"words": [word], "box": [left, top, right, bottom]}
+        # 中文词之间 Tesseract 会插入空格，这里直接拼接；英文保留空格
+        words_result = []
+        for line in lines.values():
+            joined = ""
+            for w in line["words"]:
+                if joined and joined[-1].isascii() and w[0].isascii():
+                    joined += " "
+                joined += w
+            left, top, right, bottom = line["box"]
+            words_result.append({
+                "words": joined,
+                "location": {"left": left, "top": top, "width": right - left, "height": bottom - top},
+            })
+        return {"words_result": words_result, "words_result_num": len(words_result)}
+
+
+class FakeOCRBackend(OCRBackend):
+    """进程内假后端，供测试与基准使用：返回固定文字，可模拟延迟"""
+
+    name = "fake"
+
+    def __init__(self, text="fake ocr text", latency=None):
+        super().__init__()
+        self.fake_text = text
+        self.latency = float(os.environ.get("FAKE_OCR_LATENCY", "0")) if latency is None else latency
+
+    def _recognize(self, image, lossless=False):
+        if self.latency:
+            time.sleep(self.latency)
+        h, w = image.shape[:2]
+        return {
+            "words_result_num": 1,
+            "words_result": [{"words": self.fake_text,
+                              "location": {"left": 0, "top": h // 4, "width": w, "height": max(1, h // 2)}}],
+        }
+
+
+BACKENDS = {
+    "baidu": BaiduOCRBackend,
+    "tesseract": TesseractOCRBackend,
+    "fake": FakeOCRBackend,
+}
+
+_backend = None
+
+
+def set_backend(name, **kwargs):
+    """选择本进程使用的 OCR 后端"""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"未知的 OCR 后端: {name}（可选: {', '.join(BACKENDS)}）")
+    _backend = BACKENDS[name](**kwargs)
+    return _backend
+
+
+def get_backend():
+    if _backend is None:
+        set_backend(DEFAULT_BACKEND)
+    return _backend
+
+
+def merge_stats(total, stats):
+    """将 pop_stats 的结果累加到 total 中"""
+    for name, s in stats.items():
+        t = total.setdefault(name, {"calls": 0, "seconds": 0.0, "pixels": 0})
+        for k in t:
+            t[k] += s[k]
+    return total
+
+
+def format_stats(stats):
+    """每个后端一行：调用次数、平均延迟、吞吐"""
+    lines = []
+    for name, s in sorted(stats.items()):
+        calls, seconds = s["calls"], max(s["seconds"], 1e-9)
+        lines.append(
+            f"OCR[{name}]: {calls} 次, 平均 {seconds / max(calls, 1) * 1000:.0f} ms/次, "
+            f"{calls / seconds:.2f} 次/秒, {s['pixels'] / seconds / 1e6:.2f} MP/秒"
+        )
+    return lines
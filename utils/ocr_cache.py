@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# 本地缓存目录（OCR 结果缓存等），可用环境变量 PDF2MD_CACHE_DIR 覆盖
+CACHE_DIR = os.environ.get("PDF2MD_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "pdf_to_md")
+DEFAULT_MAX_MB = 256
+
+
+class OCRCache:
+    """
+    以图像编码内容为键的 OCR 结果持久缓存（SQLite）。
+    键 = sha256(接口地址 + 选项 + base64 图像)，按总大小做 LRU 淘汰。
+    多线程各自持有连接，多进程通过 SQLite 文件锁共享同一个库。
+    """
+
+    def __init__(self, path=None, max_bytes=None, enabled=True):
+        self.path = path or os.path.join(CACHE_DIR, "ocr_cache.sqlite3")
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_MB * 1024 * 1024
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns = []
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_cache ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON ocr_cache(last_access)")
+            conn.commit()
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def close(self):
+        """关闭所有线程的连接（fork 工作进程前调用，SQLite 连接不能跨 fork 使用）"""
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+        self._local = threading.local()
+
+    @staticmethod
+    def make_key(endpoint_url, image_b64, options=None):
+        h = hashlib.sha256()
+        h.update(endpoint_url.encode("utf-8"))
+        h.update(b"\0")
+        h.update(json.dumps(options or {}, sort_keys=True).encode("utf-8"))
+        h.update(b"\0")
+        h.update(image_b64.encode("ascii") if isinstance(image_b64, str) else image_b64)
+        return h.hexdigest()
+
+    def get(self, key):
+        """命中返回 OCR 结果 dict，未命中返回 None"""
+        if not self.enabled:
+            return None
+        conn = self._conn()
+        row = conn.execute("SELECT result FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        conn.execute("UPDATE ocr_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+        data = json.dumps(result, ensure_ascii=False)
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO ocr_cache (key, result, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, data, len(data.encode("utf-8")), time.time())
+        )
+        conn.commit()
+        self._evict(conn)
+
+    def _evict(self, conn):
+        """总大小超过上限时，按最近访问时间淘汰到上限的 90%"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM ocr_cache ORDER BY last_access"):
+            keys.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM ocr_cache WHERE key = ?", keys)
+        conn.commit()
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM ocr_cache")
+        conn.commit()
+        conn.execute("VACUUM")
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def pop_counts(self):
+        """取出并清零命中 / 未命中计数（工作进程随每页统计送回父进程）"""
+        with self._lock:
+            counts = {"hits": self.hits, "misses": self.misses}
+            self.hits = self.misses = 0
+        return counts
+
+    def stats(self):
+        if os.path.exists(self.path):
+            entries, size = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_cache"
+            ).fetchone()
+        else:
+            entries, size = 0, 0
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+_cache = None
+
+
+def get_cache():
+    """
+    进程内共享的缓存实例，首次使用时创建。
+    环境变量 OCR_CACHE=0 关闭缓存，OCR_CACHE_MAX_MB 设置容量上限。
+    """
+    global _cache
+    if _cache is None:
+        _cache = OCRCache(
+            max_bytes=int(float(os.environ.get("OCR_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024),
+            enabled=os.environ.get("OCR_CACHE", "1") != "0",
+        )
+    return _cache
+
+
+def reset_cache():
+    """关闭并丢弃进程内的缓存实例，下次 get_cache 时按当前环境变量重新创建"""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+
+
+def pop_cache_counts():
+    """本进程缓存实例的命中 / 未命中计数（取出后清零）；未使用缓存时为空"""
+    return _cache.pop_counts() if _cache is not None else {}
@@ -0,0 +1,163 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+# 可通过环境变量指向本地桩服务器（见 benchmarks/fake_ocr_server.py）
+BASE_URL = os.environ.get("BAIDU_OCR_BASE_URL", "https://aip.baidubce.com").rstrip("/")
+# 账号的总 QPS 配额（多进程时由调用方按进程数均分）
+DEFAULT_QPS = float(os.environ.get("BAIDU_OCR_QPS", "2"))
+DEFAULT_CONCURRENCY = int(os.environ.get("BAIDU_OCR_CONCURRENCY", "4"))
+
+# 百度限流类错误码：4 集群超限额，18 QPS 超限；这类错误退避后重试
+THROTTLE_CODES = {4, 18}
+# access_token 无效 / 过期，刷新 token 后重试
+TOKEN_ERROR_CODES = {110, 111}
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class OCRError(RuntimeError):
+    """OCR 接口返回错误（含重试用尽），result 为最后一次的响应"""
+
+    def __init__(self, result):
+        super().__init__(f"OCR 失败 [{result.get('error_code')}]: {result.get('error_msg', '')}")
+        self.result = result
+
+
+class RateLimiter:
+    """按固定间隔发放请求时间片的线程安全限速器"""
+
+    def __init__(self, qps):
+        self.interval = 1.0 / qps if qps and qps > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class OCRClient:
+    """
+    百度 OCR 共享客户端：Session 长连接复用、线程池限定并发、QPS 限速、限流错误指数退避重试。
+    token_provider(refresh=False) 返回 access_token，refresh=True 时强制重新获取；cache 为可选的 OCRCache，命中时不发请求。
+    """
+
+    def __init__(self, token_provider, base_url=None, qps=None, max_workers=None,
+                 max_retries=4, backoff=0.5, timeout=30, cache=None):
+        self.token_provider = token_provider
+        self.cache = cache
+        self.base_url = (base_url or BASE_URL).rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_workers = max_workers or DEFAULT_CONCURRENCY
+        self.limiter = RateLimiter(DEFAULT_QPS if qps is None else qps)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def set_qps(self, qps):
+        self.limiter = RateLimiter(qps)
+
+    def endpoint_url(self, endpoint):
+        return f"{self.base_url}/rest/2.0/ocr/v1/{endpoint}"
+
+    def _sleep_backoff(self, attempt):
+        time.sleep(self.backoff * (2 ** attempt) * (1 + random.random() * 0.25))
+
+    def request(self, endpoint, image_b64, **options):
+        """
+        同步调用 OCR 接口，返回解析后的 JSON；限流与网络错误按指数退避重试。
+        接口返回错误或重试用尽时抛出 OCRError，不把失败当成空白结果。
+        """
+        url = self.endpoint_url(endpoint)
+        key = None
+        if self.cache is not None and self.cache.enabled:
+            key = self.cache.make_key(url, image_b64, options)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        data = {"image": image_b64}
+        data.update(options)
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        refresh_token = False
+        last_result = {"error_code": -1, "error_msg": "OCR 请求未发出"}
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                resp = self.session.post(
+                    url,
+                    params={"access_token": self.token_provider(refresh=refresh_token)},
+                    headers=headers, data=data, timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                self._sleep_backoff(attempt)
+                continue
+            result = last_result = _parse_response(resp)
+            if resp.status_code in RETRY_STATUS and attempt < self.max_retries:
+                self._sleep_backoff(attempt)
+                continue
+            if result.get("error_code") in TOKEN_ERROR_CODES and not refresh_token:
+                refresh_token = True
+                continue
+            refresh_token = False
+            if result.get("error_code") in THROTTLE_CODES and attempt < self.max_retries:
+                self._sleep_backoff(attempt)
+                continue
+            if "error_code" in result:
+                raise OCRError(result)
+            # 只缓存成功的结果
+            if key is not None:
+                self.cache.put(key, result)
+            return result
+        # 重试用尽
+        raise OCRError(last_result)
+
+    def submit(self, endpoint, image_b64, **options):
+        """异步提交，返回 Future；并发数受 max_workers 限制"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ocr")
+        return self._executor.submit(self.request, endpoint, image_b64, **options)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
+
+
+def _parse_response(resp):
+    """解析响应 JSON；非 JSON 响应（如网关返回的 5xx 页面）或缺少错误码的 HTTP 错误转成失败结果"""
+    try:
+        result = resp.json()
+    except ValueError:
+        result = None
+    if not isinstance(result, dict):
+        return {"error_code": resp.status_code, "error_msg": f"HTTP {resp.status_code}: {resp.text[:200]}"}
+    if not resp.ok and "error_code" not in result:
+        result["error_code"] = resp.status_code
+        result.setdefault("error_msg", f"HTTP {resp.status_code}")
+    return result
+
+
+def words_from_result(result):
+    """提取 words_result 中的文字，按行拼接"""
+    return "\n".join(w["words"] for w in result.get("words_result", []))
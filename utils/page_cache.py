@@ -0,0 +1,106 @@
+import os
+import threading
+from PIL import Image
+from utils.figures import ByteLRUCache, image_bytes
+from utils import metrics
+
+# 页面预览位图缓存上限（MB）；一页 A4 在 1.0 缩放下约 1.5 MB，3.0 缩放下约 13 MB
+PAGE_CACHE_MB = float(os.environ.get("PDF2MD_PAGE_CACHE_MB", "200"))
+# 预取当前页前后各几页
+PREFETCH_PAGES = int(os.environ.get("PDF2MD_PREFETCH_PAGES", "1"))
+# 整页像素超过该值时只渲染可见区域（A4 约在 2 倍缩放以上）
+CLIP_RENDER_PIXELS = 2_000_000
+# 可见区域向四周多渲染的比例，小幅滚动不必重新渲染
+CLIP_MARGIN = 0.25
+# 滚轮停止后多久做一次清晰渲染（毫秒），期间只缩放已有位图预览
+ZOOM_SETTLE_MS = 150
+
+
+def page_key(page_num, zoom):
+    # 缩放系数由连乘得到，取三位小数避免浮点误差造成缓存失配
+    return page_num, round(zoom, 3)
+
+
+def render_page_image(doc, page_num, zoom, clip=None):
+    """把 PDF 页面按缩放系数渲染成 PIL 图像；clip 为 (x0, y0, x1, y1) 页面坐标时只渲染该区域"""
+    import fitz
+    with metrics.span("page_view_render", page=page_num, zoom=round(zoom, 3), clip=clip is not None):
+        pix = doc.load_page(page_num).get_pixmap(matrix=fitz.Matrix(zoom, zoom),
+                                                 clip=fitz.Rect(clip) if clip else None)
+        return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+class PageRenderCache(ByteLRUCache):
+    """(页码, 缩放) -> PIL 图像 的 LRU 缓存，按像素字节数限制容量"""
+
+    def __init__(self, max_bytes=int(PAGE_CACHE_MB * 1024 * 1024)):
+        super().__init__(max_bytes, sizeof=image_bytes)
+
+    def get_page(self, doc, page_num, zoom):
+        """命中缓存直接返回，否则用 doc 渲染并放入缓存"""
+        key = page_key(page_num, zoom)
+        img = self.get(key)
+        if img is not None:
+            metrics.count("page_cache_hit")
+            return img
+        metrics.count("page_cache_miss")
+        img = render_page_image(doc, page_num, zoom)
+        self.put(key, img)
+        return img
+
+
+class PagePrefetcher:
+    """
+    后台预渲染线程：在自己打开的 fitz 文档上渲染相邻页面放入缓存
+    （fitz 文档对象不能跨线程共享）。每次 request 都替换待渲染列表，只保留最新一次导航的需求。
+    """
+
+    def __init__(self, pdf_path, cache):
+        self.pdf_path = pdf_path
+        self.cache = cache
+        self._queue = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="page-prefetch", daemon=True)
+        self._thread.start()
+
+    def request(self, pages, zoom):
+        with self._cond:
+            self._queue = [page_key(p, zoom) for p in pages]
+            self._cond.notify_all()
+
+    def request_neighbors(self, page_num, zoom, total_pages, radius=PREFETCH_PAGES):
+        pages = []
+        for d in range(1, radius + 1):
+            # 先下一页再上一页：顺序阅读时下一页最常用
+            pages += [p for p in (page_num + d, page_num - d) if 0 <= p < total_pages]
+        self.request(pages, zoom)
+
+    def _run(self):
+        doc = None
+        try:
+            while True:
+                with self._cond:
+                    while not self._queue and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        return
+                    key = self._queue.pop(0)
+                if key in self.cache:
+                    continue
+                if doc is None:
+                    import fitz
+                    doc = fitz.open(self.pdf_path)
+                try:
+                    self.cache.put(key, render_page_image(doc, *key))
+                except Exception as e:
+                    print(f"⚠️ 预渲染第 {key[0] + 1} 页失败: {e}")
+        finally:
+            if doc is not None:
+                doc.close()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._queue = []
+            self._cond.notify_all()
@@ -0,0 +1,269 @@
+import io
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+from PIL import Image
+from utils.figures import FigureRef, encode_thumbnail
+
+# 项目存储：导出目录下的单个 SQLite 文件，保存页面文字、图像描述与图像 PNG 数据，
+# 取代 page_N.md + images/page_N_j.png + record.json 的多文件布局
+STORE_NAME = "project.sqlite3"
+LEGACY_RECORD = "record.json"
+SCHEMA_VERSION = 2
+# 工作记录中图像的 PNG 压缩级别（偏向写入速度）
+PNG_COMPRESS_LEVEL = 1
+
+
+def encode_png(img_array, compress_level=PNG_COMPRESS_LEVEL):
+    buffered = io.BytesIO()
+    Image.fromarray(img_array).save(buffered, format="PNG", compress_level=compress_level)
+    return buffered.getvalue()
+
+
+def decode_png(data):
+    return np.array(Image.open(io.BytesIO(data)))
+
+
+class ProjectStore:
+    """
+    每个操作一个事务，提交后即落盘（WAL 模式，进程崩溃不会留下写了一半的状态）。
+    页面与图像都按主键 / (page, position) 索引读写，单页读写与项目大小无关。
+    多线程各自持有连接：后台写盘线程写入，界面线程读取。
+    """
+
+    def __init__(self, export_dir):
+        self.export_dir = export_dir
+        self.path = os.path.join(export_dir, STORE_NAME)
+        self._local = threading.local()
+        self._conns = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def exists(export_dir):
+        return os.path.exists(os.path.join(export_dir, STORE_NAME))
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(self.export_dir, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL：提交是原子的，断电时最多丢失最近几次提交
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS pages (page INTEGER PRIMARY KEY, text TEXT NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS figures ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, page INTEGER NOT NULL, position INTEGER NOT NULL,"
+                " description TEXT NOT NULL DEFAULT '', width INTEGER, height INTEGER, png BLOB NOT NULL,"
+                " thumb BLOB);"
+                "CREATE INDEX IF NOT EXISTS idx_figures_page ON figures(page, position);"
+            )
+            # 版本 1 没有缩略图列
+            if "thumb" not in [row[1] for row in conn.execute("PRAGMA table_info(figures)")]:
+                conn.execute("ALTER TABLE figures ADD COLUMN thumb BLOB")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                         (json.dumps(SCHEMA_VERSION),))
+            conn.commit()
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def close(self):
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+        self._local = threading.local()
+
+    def release_thread(self):
+        """关闭当前线程的连接（临时线程用完存储后调用）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            with self._lock:
+                if conn in self._conns:
+                    self._conns.remove(conn)
+            conn.close()
+            self._local.conn = None
+
+    def reset(self):
+        """清空页面与图像（重新处理同一 PDF 时使用）"""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM pages")
+            conn.execute("DELETE FROM figures")
+
+    # ---- 元信息 ----
+    def get_meta(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, **values):
+        with self._conn() as conn:
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             [(k, json.dumps(v, ensure_ascii=False)) for k, v in values.items()])
+
+    # ---- 页面文字 ----
+    def put_page(self, page, text):
+        self.put_pages({page: text})
+
+    def put_pages(self, texts):
+        """texts: {页码: 文字}，一次事务写入"""
+        with self._conn() as conn:
+            conn.executemany("INSERT OR REPLACE INTO pages (page, text) VALUES (?, ?)", list(texts.items()))
+
+    def get_page(self, page):
+        row = self._conn().execute("SELECT text FROM pages WHERE page = ?", (page,)).fetchone()
+        return row[0] if row else None
+
+    def page_texts(self):
+        """{页码: 文字}"""
+        return dict(self._conn().execute("SELECT page, text FROM pages"))
+
+    # ---- 图像 ----
+    def page_figures(self, page):
+        """本页图像 [(id, description, width, height)]，按位置排序，不读取 PNG 数据"""
+        return self._conn().execute(
+            "SELECT id, description, width, height FROM figures WHERE page = ? ORDER BY position", (page,)
+        ).fetchall()
+
+    def all_figures(self):
+        """{页码: [(id, description, width, height)]}"""
+        result = {}
+        for page, fid, desc, w, h in self._conn().execute(
+                "SELECT page, id, description, width, height FROM figures ORDER BY page, position"):
+            result.setdefault(page, []).append((fid, desc, w, h))
+        return result
+
+    def figure_png(self, figure_id):
+        row = self._conn().execute("SELECT png FROM figures WHERE id = ?", (figure_id,)).fetchone()
+        return row[0] if row else None
+
+    def figure_thumb(self, figure_id):
+        row = self._conn().execute("SELECT thumb FROM figures WHERE id = ?", (figure_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_figure_thumb(self, figure_id, data):
+        with self._conn() as conn:
+            conn.execute("UPDATE figures SET thumb = ? WHERE id = ?", (data, figure_id))
+
+    def figure_array(self, figure_id):
+        data = self.figure_png(figure_id)
+        return decode_png(data) if data is not None else None
+
+    def figure_refs(self):
+        """{页码: ([FigureRef], [description])}，只读元数据，不读取 PNG 数据"""
+        return {page: ([FigureRef(self, fid, w, h) for fid, _, w, h in figures], [d for _, d, _, _ in figures])
+                for page, figures in self.all_figures().items()}
+
+    def set_page_figures(self, page, figures, descriptions=None):
+        """
+        设置一页的图像列表。figures 中每项为已存储图像的 id / FigureRef（保留原 PNG，只更新位置）
+        或 numpy 数组（编码后新增）；本页不在列表中的旧图像被删除。返回按顺序的 id 列表。
+        引用的行已不存在时（如被并发的重新提取删除），用缓存中解码过的像素重新写入，取不到则跳过并提示。
+        """
+        sources = list(figures)
+        figures = [f.figure_id if isinstance(f, FigureRef) and f.store.path == self.path else f
+                   for f in sources]
+        figures = [f.array() if isinstance(f, FigureRef) else f for f in figures]
+        descriptions = list(descriptions or [])
+        descriptions += [""] * (len(figures) - len(descriptions))
+        # 编码（含缩略图）放在事务外，避免长时间持有写锁
+        encoded = [None if isinstance(f, (int, np.integer)) else (encode_png(f), encode_thumbnail(f))
+                   for f in figures]
+        ids = []
+        with self._conn() as conn:
+            for position, (figure, data, desc, source) in enumerate(zip(figures, encoded, descriptions, sources)):
+                if data is None:
+                    cur = conn.execute("UPDATE figures SET page = ?, position = ?, description = ? WHERE id = ?",
+                                       (page, position, desc, int(figure)))
+                    if cur.rowcount:
+                        ids.append(int(figure))
+                        continue
+                    figure_id, figure = int(figure), source.array() if isinstance(source, FigureRef) else None
+                    if figure is None:
+                        print(f"⚠️ 第 {page + 1} 页的图像 {figure_id} 已不在项目存储中，跳过")
+                        continue
+                    data = (encode_png(figure), encode_thumbnail(figure))
+                cur = conn.execute(
+                    "INSERT INTO figures (page, position, description, width, height, png, thumb) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (page, position, desc, figure.shape[1], figure.shape[0]) + data)
+                ids.append(cur.lastrowid)
+            placeholders = ",".join("?" * len(ids))
+            conn.execute(f"DELETE FROM figures WHERE page = ? AND id NOT IN ({placeholders})", [page] + ids)
+        return ids
+
+    def set_descriptions(self, descriptions):
+        """descriptions: {页码: [描述, ...]}，按位置更新"""
+        with self._conn() as conn:
+            conn.executemany(
+                "UPDATE figures SET description = ? WHERE page = ? AND position = ?",
+                [(desc, page, position) for page, descs in descriptions.items()
+                 for position, desc in enumerate(descs)])
+
+
+def migrate_record(export_dir):
+    """
+    把旧布局（record.json + page_N.md + images/page_N_j.png）导入项目存储。
+    PNG 按原字节存入，不解码；旧文件保留不动。返回 ProjectStore。
+    """
+    with open(os.path.join(export_dir, LEGACY_RECORD), "r", encoding="utf-8") as f:
+        record = json.load(f)
+    store = ProjectStore(export_dir)
+    texts = {}
+    for i, md_path in record.get("md_files", {}).items():
+        with open(os.path.join(export_dir, md_path), "r", encoding="utf-8") as f:
+            texts[int(i)] = f.read()
+    descriptions = record.get("image_descriptions", {})
+    with store._conn() as conn:
+        conn.execute("DELETE FROM pages")
+        conn.execute("DELETE FROM figures")
+        conn.execute("DELETE FROM meta WHERE key = 'page_count'")
+        conn.executemany("INSERT INTO pages (page, text) VALUES (?, ?)", list(texts.items()))
+        for i, img_list in record.get("images_content", {}).items():
+            descs = descriptions.get(i, [])
+            position = 0
+            for j, img_path in enumerate(img_list):
+                abs_path = os.path.join(export_dir, img_path)
+                try:
+                    with open(abs_path, "rb") as f:
+                        png = f.read()
+                    with Image.open(io.BytesIO(png)) as img:  # 只读文件头取尺寸
+                        width, height = img.size
+                except (OSError, Image.UnidentifiedImageError) as e:
+                    # 记录中列出但已丢失或损坏的图像跳过，不中断整个迁移
+                    print(f"⚠️ 迁移时跳过图像 {img_path}: {e}")
+                    continue
+                desc = descs[j] if j < len(descs) else ""
+                conn.execute(
+                    "INSERT INTO figures (page, position, description, width, height, png) VALUES (?, ?, ?, ?, ?, ?)",
+                    (int(i), position, desc, width, height, png))
+                position += 1
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [
+            ("pdf_path", json.dumps(record.get("pdf_path"), ensure_ascii=False)),
+            ("current_page", json.dumps(record.get("current_page", 0))),
+            ("page_count", json.dumps(len(texts))),
+        ])
+    return store
+
+
+def open_project(export_dir):
+    """打开导出目录中的项目；只有旧的 record.json 时先迁移。两者都没有时返回 None"""
+    has_legacy = os.path.exists(os.path.join(export_dir, LEGACY_RECORD))
+    if ProjectStore.exists(export_dir):
+        store = ProjectStore(export_dir)
+        # 迁移在单个事务中完成，page_count 缺失说明上次迁移未完成
+        if store.get_meta("page_count") is not None or not has_legacy:
+            return store
+        store.close()
+        return migrate_record(export_dir)
+    if has_legacy:
+        return migrate_record(export_dir)
+    return None
+
+
+def has_project(export_dir):
+    return ProjectStore.exists(export_dir) or os.path.exists(os.path.join(export_dir, LEGACY_RECORD))
@@ -0,0 +1,170 @@
+import time
+import threading
+from utils import metrics
+
+
+def save_record(store, pdf_path, current_page, md_content, images_content, image_descriptions,
+                md_pages=None, image_pages=None, desc_pages=None):
+    """
+    把工作状态写入项目存储（utils.project_store.ProjectStore）。
+    md_pages / image_pages / desc_pages 为需要写入的页码集合，None 表示全部；
+    写入图像的页面同时写入其描述，desc_pages 只需包含仅改了描述的页面。元信息总是写入。
+    返回各部分耗时（秒）：{"md", "images", "meta"}。
+    """
+    timings = {}
+
+    t0 = time.perf_counter()
+    pages = range(len(md_content)) if md_pages is None else sorted(md_pages)
+    store.put_pages({i: md_content[i] for i in pages if i < len(md_content)})
+    timings["md"] = time.perf_counter() - t0
+    metrics.record("record_md", time.time() - timings["md"], timings["md"], pages=len(md_content))
+
+    t0 = time.perf_counter()
+    image_pages = list(images_content) if image_pages is None else sorted(image_pages)
+    for page_idx in image_pages:
+        store.set_page_figures(page_idx, images_content.get(page_idx, []), image_descriptions.get(page_idx))
+    timings["images"] = time.perf_counter() - t0
+    metrics.record("record_images", time.time() - timings["images"], timings["images"])
+
+    t0 = time.perf_counter()
+    store.set_descriptions(_changed_descriptions(image_descriptions, image_pages, desc_pages))
+    _write_meta(store, pdf_path, current_page, len(md_content))
+    timings["meta"] = time.perf_counter() - t0
+    metrics.record("record_meta", time.time() - timings["meta"], timings["meta"])
+    return timings
+
+
+def _write_meta(store, pdf_path, current_page, page_count):
+    store.set_meta(pdf_path=pdf_path, current_page=current_page, page_count=page_count)
+
+
+def _changed_descriptions(image_descriptions, image_pages, desc_pages):
+    """需要单独写入描述的页面（已随图像写入的页面除外），各页复制一份作为快照"""
+    pages = image_descriptions if desc_pages is None else desc_pages
+    return {page: list(image_descriptions[page]) for page in sorted(set(pages) - set(image_pages))
+            if page in image_descriptions}
+
+
+class RecordWriter:
+    """
+    后台写盘线程：任务按 key 合并（同一页的 md / 图像、元信息各自只保留最新的一次），
+    按提交顺序依次执行。on_progress(done, total) 在写入线程中回调，调用方自行转交界面线程。
+    """
+
+    def __init__(self, on_progress=None):
+        self.on_progress = on_progress
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._busy = False
+        self._done = 0
+        self._total = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="record-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, key, func, *args):
+        with self._cond:
+            if key in self._pending:
+                # 被合并的旧任务不再计入进度
+                self._pending.pop(key)
+                self._total -= 1
+            self._pending[key] = (func, args)
+            self._total += 1
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                key = next(iter(self._pending))
+                func, args = self._pending.pop(key)
+                self._busy = True
+            try:
+                with metrics.span("record_write", key=str(key)):
+                    func(*args)
+            except Exception as e:
+                print(f"❌ 记录写入失败 {key}: {e}")
+            with self._cond:
+                self._busy = False
+                self._done += 1
+                done, total = self._done, self._total
+                if not self._pending:
+                    self._done = self._total = 0
+                self._cond.notify_all()
+            if self.on_progress:
+                self.on_progress(done, total)
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending) + self._busy
+
+    def flush(self, timeout=None):
+        """等待已提交的任务全部写完；返回是否写完"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def close(self, timeout=None):
+        done = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        return done
+
+
+def _save_page_figures(store, page, figures, descriptions, on_figures_saved=None):
+    ids = store.set_page_figures(page, figures, descriptions)
+    if on_figures_saved:
+        on_figures_saved(page, figures, ids)
+
+
+def submit_record(writer, store, pdf_path, current_page, md_content, images_content, image_descriptions,
+                  md_pages=None, image_pages=None, desc_pages=None, on_figures_saved=None):
+    """
+    与 save_record 相同的写入内容，但交给后台 RecordWriter；提交时对数据做快照，
+    之后界面线程继续修改 md_content / images_content 不会影响已提交的任务。
+    md_pages 与 image_pages 均为 None（整体写入）时先清空存储中的旧内容。
+    on_figures_saved(page, figures, ids) 在一页图像写入后于写盘线程中回调，
+    调用方可借此把内存中的数组换成 FigureRef。
+    """
+    if md_pages is None and image_pages is None:
+        writer.submit((store.path, "reset"), store.reset)
+    if md_pages is None:
+        writer.submit((store.path, "md", "all"), store.put_pages, dict(enumerate(md_content)))
+    else:
+        for i in sorted(md_pages):
+            if i < len(md_content):
+                writer.submit((store.path, "md", i), store.put_page, i, md_content[i])
+    image_pages = list(images_content) if image_pages is None else sorted(image_pages)
+    for page_idx in image_pages:
+        writer.submit((store.path, "images", page_idx), _save_page_figures, store, page_idx,
+                      list(images_content.get(page_idx, [])), list(image_descriptions.get(page_idx, [])),
+                      on_figures_saved)
+    # 只改了描述的页面按页写入，不必每次更新全部图像行
+    for page_idx, descriptions in _changed_descriptions(image_descriptions, image_pages, desc_pages).items():
+        writer.submit((store.path, "desc", page_idx), store.set_descriptions, {page_idx: descriptions})
+    writer.submit((store.path, "meta"), _write_meta, store, pdf_path, current_page, len(md_content))
+
+
+def submit_extraction_start(writer, store, pdf_path, page_count):
+    """新的提取开始：清空存储并记录提取未完成，之后各页结果由 submit_page_result 逐页写入"""
+    writer.submit((store.path, "reset"), store.reset)
+    writer.submit((store.path, "extraction_start"), _set_meta, store, dict(
+        pdf_path=pdf_path, current_page=0, page_count=page_count, extraction_done=False))
+
+
+def submit_page_result(writer, store, page, text, figures, descriptions, on_figures_saved=None):
+    """一页的提取结果写入存储（检查点）；pages 表中有记录的页面即视为已完成，恢复时跳过"""
+    writer.submit((store.path, "images", page), _save_page_figures, store, page,
+                  list(figures), list(descriptions), on_figures_saved)
+    writer.submit((store.path, "md", page), store.put_page, page, text)
+
+
+def submit_extraction_done(writer, store):
+    writer.submit((store.path, "extraction_done"), _set_meta, store, dict(extraction_done=True))
+
+
+def _set_meta(store, values):
+    store.set_meta(**values)
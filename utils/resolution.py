@@ -0,0 +1,63 @@
+import os
+import math
+
+# 各阶段的默认分辨率，均不超过任务指定的 dpi（即最终裁剪分辨率）
+# detect: 文字层页面只需找出图形位置，低分辨率即可
+DETECT_DPI = int(os.environ.get("PDF2MD_DETECT_DPI", "150"))
+# ocr: 扫描页整页识别的分辨率，还受 OCR 后端最长边限制
+OCR_DPI = int(os.environ.get("PDF2MD_OCR_DPI", "300"))
+MIN_DPI = 72
+# 大幅面页面检测时的像素上限
+MAX_DETECT_PIXELS = 8_000_000
+
+
+def choose_dpi(page_rect, stage, has_text, max_dpi=300, max_side=None):
+    """
+    按页面尺寸、是否有文字层与 OCR 后端限制选择某一阶段的渲染分辨率。
+    stage: "detect"（图形检测）/ "ocr"（整页 OCR 负载）/ "crop"（最终图形裁剪）
+    """
+    width, height = page_rect.width, page_rect.height
+    if stage == "crop":
+        return max_dpi
+    if stage == "detect":
+        # 扫描页的检测直接复用 OCR 渲染结果
+        dpi = min(DETECT_DPI, max_dpi) if has_text else min(OCR_DPI, max_dpi)
+        if width and height:
+            dpi = min(dpi, 72 * math.sqrt(MAX_DETECT_PIXELS / (width * height)))
+        return max(MIN_DPI, int(dpi))
+    if stage == "ocr":
+        dpi = max(MIN_DPI, min(OCR_DPI, max_dpi))
+        long_side = max(width, height)
+        if max_side and long_side:
+            # 后端最长边限制优先于最低分辨率
+            dpi = min(dpi, int(max_side * 72 / long_side))
+        return int(dpi)
+    raise ValueError(f"未知的渲染阶段: {stage}")
+
+
+def baseline_pixels(page_rect, dpi):
+    """按固定 dpi 渲染整页所需的像素数，用于与自适应策略对比"""
+    scale = dpi / 72
+    return int(round(page_rect.width * scale)) * int(round(page_rect.height * scale))
+
+
+def new_render_stats():
+    return {"pages": 0, "renders": 0, "pixels": 0, "baseline_pixels": 0, "seconds": 0.0}
+
+
+def merge_render_stats(total, stats):
+    for k, v in stats.items():
+        total[k] = total.get(k, 0) + v
+    return total
+
+
+def format_render_stats(stats, dpi=300):
+    """渲染像素数、与固定 dpi 整页渲染的对比及估计节省的时间"""
+    pixels, baseline, seconds = stats.get("pixels", 0), stats.get("baseline_pixels", 0), stats.get("seconds", 0.0)
+    line = (f"渲染: {stats.get('renders', 0)} 次, {pixels / 1e6:.1f} MP"
+            f"（固定 {dpi} dpi 整页渲染需 {baseline / 1e6:.1f} MP）, 耗时 {seconds:.2f} 秒")
+    if pixels:
+        # 按实测的每像素渲染耗时估算固定 dpi 方案的渲染时间
+        saved = max(0.0, seconds * baseline / pixels - seconds)
+        line += f", 估计节省 {saved:.2f} 秒"
+    return line
@@ -0,0 +1,47 @@
+import os
+import shutil
+import uuid
+import numpy as np
+
+# 进程间传递图像的溢出文件通道：
+# 工作进程把像素一次性写入溢出文件，只把轻量句柄 (path, shape, dtype, offset) 交给父进程，
+# 读取方用 np.memmap 直接映射文件，不再经过 pickle / Manager 多次拷贝。
+
+
+def write_arrays(arrays, spill_dir, prefix="fig"):
+    """将一组数组顺序写入同一个溢出文件，返回对应的句柄列表"""
+    if not arrays:
+        return []
+    os.makedirs(spill_dir, exist_ok=True)
+    path = os.path.join(spill_dir, f"{prefix}_{os.getpid()}_{uuid.uuid4().hex[:8]}.bin")
+    handles = []
+    offset = 0
+    with open(path, "wb") as f:
+        for arr in arrays:
+            arr = np.ascontiguousarray(arr)
+            arr.tofile(f)
+            handles.append((path, tuple(arr.shape), arr.dtype.str, offset))
+            offset += arr.nbytes
+    return handles
+
+
+def is_handle(obj):
+    return isinstance(obj, tuple) and len(obj) == 4 and isinstance(obj[0], str)
+
+
+def load_array(handle, copy=False):
+    """根据句柄映射出数组；copy=True 时复制为普通内存数组"""
+    path, shape, dtype, offset = handle
+    arr = np.memmap(path, dtype=np.dtype(dtype), mode="r", offset=offset, shape=tuple(shape))
+    return np.array(arr) if copy else arr
+
+
+def load_arrays(items, copy=False):
+    """将列表中的句柄替换为数组，已是数组的元素原样返回"""
+    return [load_array(x, copy) if is_handle(x) else x for x in items]
+
+
+def cleanup(spill_dir):
+    """删除溢出目录（Windows 下仍被映射的文件会被跳过）"""
+    if spill_dir and os.path.isdir(spill_dir):
+        shutil.rmtree(spill_dir, ignore_errors=True)